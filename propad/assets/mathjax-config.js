@@ -35,7 +35,8 @@ window.MathJax = {
         }
     },
     svg: {
-        fontCache: 'global',
+        // Self-contained SVGs, so typeset output can be cloned from the cache
+        fontCache: 'local',
         scale: 1,
         minScale: 0.5
     },
@@ -44,8 +45,14 @@ window.MathJax = {
         ignoreHtmlClass: 'no-mathjax'
     },
     startup: {
+        // The page is typeset by typesetMath() from mathjax-render.js
+        typeset: false,
         pageReady: () => {
-            return MathJax.startup.defaultPageReady();
+            return MathJax.startup.defaultPageReady().then(() => {
+                if (window.typesetMath) {
+                    window.typesetMath(document.body);
+                }
+            });
         }
     }
 };
@@ -53,14 +60,7 @@ window.MathJax = {
 // 2. DYNAMIC LIBRARY LOADER (Ensures config is set before loading the library)
 (function() {
     var script = document.createElement('script');
-    script.src = 'https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-svg.js';
+    script.src = '{mathjax_url}';
     script.async = true;
     document.head.appendChild(script);
 })();
-
-// 3. RENDER TRIGGER (From mathjax-render.js)
-window.addEventListener('load', () => {
-    if (window.MathJax) {
-        MathJax.typesetPromise().catch((err) => console.log('MathJax error:', err));
-    }
-});
\ No newline at end of file
@@ -1,5 +1,83 @@
-window.addEventListener('load', () => {
-    if (window.MathJax) {
-        MathJax.typesetPromise().catch((err) => console.log('MathJax error:', err));
+// Incremental math typesetting: only the nodes handed in are scanned, and
+// each distinct expression is typeset once and cloned after that.
+(function () {
+    const SKIP_TAGS = new Set([
+        'SCRIPT', 'NOSCRIPT', 'STYLE', 'TEXTAREA', 'PRE', 'CODE', 'MJX-CONTAINER'
+    ]);
+    const SKIP_CLASSES = ['no-mathjax', 'mermaid'];
+
+    // Same delimiters as mathjax-config.js, plus bare environments
+    const MATH_RE = /(\\\$)|\$\$([\s\S]+?)\$\$|\\\[([\s\S]+?)\\\]|\\\(([\s\S]+?)\\\)|\$((?:\\[\s\S]|[^$\\])+?)\$|(\\begin\{([A-Za-z]+\*?)\}[\s\S]*?\\end\{\7\})/g;
+
+    // Typeset output keyed by display mode and TeX source
+    const mathCache = new Map();
+
+    function acceptNode(node) {
+        if (node.nodeType === Node.TEXT_NODE) {
+            return /[$\\]/.test(node.data) ? NodeFilter.FILTER_ACCEPT : NodeFilter.FILTER_SKIP;
+        }
+        if (SKIP_TAGS.has(node.tagName) ||
+            SKIP_CLASSES.some((name) => node.classList.contains(name))) {
+            return NodeFilter.FILTER_REJECT;
+        }
+        return NodeFilter.FILTER_SKIP;
     }
-});
\ No newline at end of file
+
+    function renderMath(tex, display) {
+        const key = (display ? 'D' : 'I') + tex;
+        let node = mathCache.get(key);
+        if (node === undefined) {
+            node = MathJax.tex2svg(tex, { display: display });
+            mathCache.set(key, node);
+        }
+        return node.cloneNode(true);
+    }
+
+    function typesetText(textNode) {
+        const text = textNode.data;
+        const fragment = document.createDocumentFragment();
+        let last = 0;
+        let found = false;
+
+        for (const match of text.matchAll(MATH_RE)) {
+            found = true;
+            fragment.append(text.slice(last, match.index));
+            last = match.index + match[0].length;
+
+            if (match[1]) {
+                fragment.append('$');
+                continue;
+            }
+            const inline = match[4] !== undefined || match[5] !== undefined;
+            const tex = match[2] ?? match[3] ?? match[4] ?? match[5] ?? match[6];
+            try {
+                fragment.append(renderMath(tex, !inline));
+            } catch (err) {
+                console.log('MathJax error:', err);
+                fragment.append(match[0]);
+            }
+        }
+
+        if (found) {
+            fragment.append(text.slice(last));
+            textNode.replaceWith(fragment);
+        }
+    }
+
+    function typesetNode(root) {
+        const walker = document.createTreeWalker(
+            root, NodeFilter.SHOW_ELEMENT | NodeFilter.SHOW_TEXT, { acceptNode }
+        );
+        const textNodes = [];
+        while (walker.nextNode()) {
+            textNodes.push(walker.currentNode);
+        }
+        textNodes.forEach(typesetText);
+    }
+
+    // Until MathJax has started, startup typesets the whole page instead
+    window.typesetMath = function (nodes) {
+        if (!(window.MathJax && MathJax.tex2svg)) return;
+        (Array.isArray(nodes) ? nodes : [nodes]).forEach(typesetNode);
+    };
+})();
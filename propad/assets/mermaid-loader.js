@@ -1,8 +1,12 @@
-import mermaid from 'https://cdn.jsdelivr.net/npm/mermaid@11/dist/mermaid.esm.min.mjs';
+// Uses the global mermaid from the UMD build loaded before this script
 
-mermaid.initialize({ 
+// The page theme lives in the dark class on <html>
+function currentMermaidTheme() {
+    return document.documentElement.classList.contains('dark') ? 'dark' : 'default';
+}
+
+const mermaidConfig = {
     startOnLoad: false,  // Changed to false for manual control
-    theme: '{mermaid_theme}',
     securityLevel: 'loose',
     logLevel: 'debug',  // Changed to debug to see what's happening
     flowchart: {
@@ -47,23 +51,59 @@ mermaid.initialize({
     block: {
         useMaxWidth: true
     }
-});
+};
+
+mermaid.initialize({ ...mermaidConfig, theme: currentMermaidTheme() });
+
+// Rendered SVGs keyed by theme and diagram source
+const diagramCache = new Map();
 
-// Render Mermaid diagrams - try multiple times to ensure rendering
+function diagramKey(el) {
+    return currentMermaidTheme() + '\0' + el.dataset.source;
+}
+
+// Hand new diagrams to the app so they survive reloads and restarts
+function storeDiagram(el) {
+    const handlers = window.webkit && window.webkit.messageHandlers;
+    if (handlers && handlers.propadMermaid) {
+        handlers.propadMermaid.postMessage({
+            source: el.dataset.source,
+            theme: currentMermaidTheme(),
+            svg: el.innerHTML
+        });
+    }
+}
+
+// Render Mermaid diagrams - only new or edited ones go through layout
 async function renderMermaid() {
     try {
-        const mermaidElements = document.querySelectorAll('.mermaid');
-        console.log('Found mermaid elements:', mermaidElements.length);
-        
-        if (mermaidElements.length > 0) {
-            mermaidElements.forEach(el => {
-                console.log('Mermaid content:', el.textContent.substring(0, 100));
-            });
-            
-            await mermaid.run({
-                querySelector: '.mermaid'
+        const mermaidElements = document.querySelectorAll('.mermaid:not([data-processed])');
+        const nodes = [];
+
+        mermaidElements.forEach(el => {
+            // Keep the source so the diagram can be re-themed later
+            if (el.dataset.source === undefined) {
+                el.dataset.source = el.textContent;
+            }
+            const svg = diagramCache.get(diagramKey(el));
+            if (svg !== undefined) {
+                el.innerHTML = svg;
+                el.dataset.theme = currentMermaidTheme();
+                el.setAttribute('data-processed', 'true');
+            } else {
+                nodes.push(el);
+            }
+        });
+
+        if (nodes.length > 0) {
+            await mermaid.run({ nodes: nodes });
+            nodes.forEach(el => {
+                if (el.querySelector('svg')) {
+                    el.dataset.theme = currentMermaidTheme();
+                    diagramCache.set(diagramKey(el), el.innerHTML);
+                    storeDiagram(el);
+                }
             });
-            console.log('Mermaid rendering complete');
         }
     } catch (error) {
         console.error('Mermaid rendering error:', error);
@@ -74,5 +114,20 @@ async function renderMermaid() {
 window.addEventListener('DOMContentLoaded', renderMermaid);
 window.addEventListener('load', renderMermaid);
 
+// Re-render already drawn diagrams after the page theme changed
+async function rethemeMermaid() {
+    mermaid.initialize({ ...mermaidConfig, theme: currentMermaidTheme() });
+    document.querySelectorAll('.mermaid[data-processed]').forEach(el => {
+        // Diagrams inlined from the app cache are not in the page cache yet
+        if (el.dataset.theme && el.querySelector('svg')) {
+            diagramCache.set(el.dataset.theme + '\0' + el.dataset.source, el.innerHTML);
+        }
+        el.removeAttribute('data-processed');
+        el.textContent = el.dataset.source || '';
+    });
+    await renderMermaid();
+}
+
 // Also expose function globally in case we need to trigger it manually
-window.renderMermaid = renderMermaid;
\ No newline at end of file
+window.renderMermaid = renderMermaid;
+window.rethemeMermaid = rethemeMermaid;
\ No newline at end of file
@@ -0,0 +1,164 @@
+// Long-lived preview page: content arrives as keyed block patches
+// instead of full document reloads.
+(function () {
+    const root = () => document.getElementById('preview');
+
+    function typeset(nodes) {
+        if (nodes.length === 0) return;
+        if (window.renderMermaid) {
+            window.renderMermaid();
+        }
+        if (window.typesetMath) {
+            window.typesetMath(nodes);
+        }
+    }
+
+    // Source line index: one entry per block, sorted by both page offset
+    // and source line, rebuilt lazily after the layout changes
+    let lineIndex = null;
+
+    function invalidateIndex() {
+        lineIndex = null;
+    }
+
+    function buildIndex() {
+        const range = document.createRange();
+        const index = [];
+        for (const el of root().children) {
+            if (el.dataset.line === undefined) continue;
+            // Blocks are display: contents, so measure what they hold
+            range.selectNodeContents(el);
+            const rect = range.getBoundingClientRect();
+            const top = rect.top + window.scrollY;
+            index.push({
+                top: top,
+                bottom: top + rect.height,
+                line: Number(el.dataset.line),
+                end: Number(el.dataset.end),
+            });
+        }
+        return index;
+    }
+
+    // Last entry whose field is <= value, or -1
+    function search(index, field, value) {
+        let lo = 0;
+        let hi = index.length - 1;
+        let found = -1;
+        while (lo <= hi) {
+            const mid = (lo + hi) >> 1;
+            if (index[mid][field] <= value) {
+                found = mid;
+                lo = mid + 1;
+            } else {
+                hi = mid - 1;
+            }
+        }
+        return found;
+    }
+
+    function lineAtOffset(y) {
+        lineIndex = lineIndex || buildIndex();
+        const i = search(lineIndex, 'top', y);
+        if (i < 0) return 0;
+        const entry = lineIndex[i];
+        const height = entry.bottom - entry.top;
+        const fraction = height > 0 ? Math.min((y - entry.top) / height, 1) : 0;
+        return entry.line + fraction * (entry.end - entry.line);
+    }
+
+    function offsetOfLine(line) {
+        lineIndex = lineIndex || buildIndex();
+        const i = search(lineIndex, 'line', line);
+        if (i < 0) return 0;
+        const entry = lineIndex[i];
+        const span = entry.end - entry.line;
+        const fraction = span > 0 ? Math.min((line - entry.line) / span, 1) : 0;
+        return entry.top + fraction * (entry.bottom - entry.top);
+    }
+
+    window.propadScrollToLine = function (line) {
+        window.scrollTo(0, offsetOfLine(line));
+    };
+
+    // Diagrams, math, images and the window width all move blocks
+    new ResizeObserver(invalidateIndex).observe(document.documentElement);
+
+    // order: block ids in document order
+    // blocks: html for the ids the page does not have yet
+    // lines: [line, end_line] of each block in order, 0-based
+    window.propadPatch = function (order, blocks, lines) {
+        const container = root();
+        const existing = new Map();
+        for (const el of container.children) {
+            existing.set(el.id, el);
+        }
+
+        const added = [];
+        let cursor = container.firstElementChild;
+        order.forEach((id, i) => {
+            let el = existing.get(id);
+            if (el) {
+                existing.delete(id);
+            } else {
+                el = document.createElement('div');
+                el.id = id;
+                el.className = 'md-block';
+                el.innerHTML = blocks[id] || '';
+                added.push(el);
+            }
+            if (lines) {
+                el.dataset.line = lines[i][0];
+                el.dataset.end = lines[i][1];
+            }
+            if (el === cursor) {
+                cursor = cursor.nextElementSibling;
+            } else {
+                container.insertBefore(el, cursor);
+            }
+        });
+
+        for (const el of existing.values()) {
+            el.remove();
+        }
+        invalidateIndex();
+        typeset(added);
+    };
+
+    // Scroll sync: report the position only when it has moved, at most
+    // once per frame, so an idle page never wakes the app
+    let lastScroll = 0;
+    let scrollFrame = 0;
+
+    function reportScroll() {
+        scrollFrame = 0;
+        const maxScroll = Math.max(
+            document.documentElement.scrollHeight - window.innerHeight, 0
+        );
+        const scrollTop = window.pageYOffset || document.documentElement.scrollTop;
+        const percentage = maxScroll === 0 ? 0 : scrollTop / maxScroll;
+        if (Math.abs(percentage - lastScroll) <= 0.003) return;
+        lastScroll = percentage;
+        window.webkit.messageHandlers.propadScroll.postMessage({
+            percentage: percentage,
+            line: root().childElementCount ? lineAtOffset(scrollTop) : null,
+        });
+    }
+
+    window.addEventListener('scroll', () => {
+        if (!scrollFrame) {
+            scrollFrame = requestAnimationFrame(reportScroll);
+        }
+    }, { passive: true });
+
+    // Theme switch: the colors are CSS variables keyed on the dark class,
+    // so only already drawn diagrams need work
+    window.propadSetTheme = function (dark) {
+        const html = document.documentElement;
+        if (html.classList.contains('dark') === dark) return;
+        html.classList.toggle('dark', dark);
+        if (window.rethemeMermaid) {
+            window.rethemeMermaid();
+        }
+    };
+})();
@@ -0,0 +1,298 @@
+import gi
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+gi.require_version("Gtk", "4.0")
+gi.require_version("WebKit", "6.0")
+gi.require_version("Gdk", "4.0")
+
+from gi.repository import Gtk, WebKit, GLib, Gdk
+from propad.cli import collect_sources, output_targets, render_documents
+
+BATCH_FORMATS = ("html", "pdf", "png")
+
+# Offscreen views kept alive for the PDF and image stages
+MAX_WEBVIEWS = 4
+# Time given to MathJax and Mermaid after a page has loaded, in ms
+SETTLE_DELAY = 300
+
+PAGE_WIDTH = 1920
+PAGE_HEIGHT = 1080
+
+
+class WebViewPool:
+    """A bounded set of offscreen WebViews that are reused between jobs.
+
+    Everything runs in the main thread: acquire() hands a free view to the
+    callback right away or as soon as one is released.
+    """
+
+    def __init__(self, size: int = MAX_WEBVIEWS):
+        self.size = size
+        self._views = []
+        self._idle = []
+        self._waiting = []
+
+    def _create_view(self):
+        settings = WebKit.Settings()
+        settings.set_enable_javascript(True)
+        settings.set_hardware_acceleration_policy(
+            WebKit.HardwareAccelerationPolicy.ALWAYS
+        )
+
+        webview = WebKit.WebView()
+        webview.set_settings(settings)
+        webview.set_size_request(PAGE_WIDTH, PAGE_HEIGHT)
+        try:
+            webview.set_background_color(Gdk.RGBA(1, 1, 1, 1))
+        except Exception:
+            pass
+
+        # One handler per view, forwarding to whichever job owns it
+        webview.on_loaded = None
+
+        def on_load_changed(web_view, event):
+            if event == WebKit.LoadEvent.FINISHED and web_view.on_loaded:
+                callback = web_view.on_loaded
+                web_view.on_loaded = None
+                callback()
+
+        webview.connect("load-changed", on_load_changed)
+        self._views.append(webview)
+        return webview
+
+    def acquire(self, callback):
+        if self._idle:
+            callback(self._idle.pop())
+        elif len(self._views) < self.size:
+            callback(self._create_view())
+        else:
+            self._waiting.append(callback)
+
+    def release(self, webview):
+        webview.on_loaded = None
+        if self._waiting:
+            self._waiting.pop(0)(webview)
+        else:
+            self._idle.append(webview)
+
+    def close(self):
+        for webview in self._views:
+            try:
+                webview.try_close()
+            except Exception:
+                pass
+        self._views = []
+        self._idle = []
+        self._waiting = []
+
+
+class BatchExporter:
+    """Exports every Markdown file under a folder to HTML, PDF and PNG.
+
+    Markdown is rendered across a process pool and the PDF and PNG stages
+    share a WebViewPool. on_progress(done, total, source, error) is called
+    in the main thread once each file is finished, and on_finished(failed)
+    after the last one.
+    """
+
+    def __init__(
+        self,
+        source_dir: str,
+        output_dir: str,
+        formats,
+        on_progress,
+        on_finished,
+        is_dark: bool = False,
+        max_webviews: int = MAX_WEBVIEWS,
+    ):
+        self.source_dir = source_dir
+        self.output_dir = output_dir
+        self.formats = [fmt for fmt in BATCH_FORMATS if fmt in formats]
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+
+        # PDFs are always light, like the single-file export
+        self.themes = {fmt: is_dark for fmt in self.formats}
+        if "pdf" in self.themes:
+            self.themes["pdf"] = False
+
+        self.webview_pool = WebViewPool(max_webviews)
+        self._executor = None
+        self.total = 0
+        self.done = 0
+        self.failed = []
+        self.cancelled = False
+
+    def start(self) -> int:
+        """Start exporting; returns the number of files found."""
+        sources = collect_sources([self.source_dir])
+        self.total = len(sources)
+        if not sources:
+            GLib.idle_add(self._finish)
+            return 0
+
+        # Forking a process that runs GTK and WebKit threads is unsafe.
+        # Spawned workers re-import main.py, which keeps GTK out of them.
+        self._executor = ProcessPoolExecutor(
+            mp_context=multiprocessing.get_context("spawn")
+        )
+
+        targets, clashes = output_targets(sources, self.output_dir)
+        for source, owner in clashes:
+            # Skipped instead of racing the other file for its outputs
+            GLib.idle_add(
+                self._file_done,
+                source,
+                RuntimeError(f"same output file as {owner}"),
+            )
+
+        for source, target in targets:
+            html_target = f"{target}.html" if "html" in self.formats else None
+            future = self._executor.submit(
+                render_documents, source, html_target, self.themes
+            )
+            future.add_done_callback(
+                lambda future, source=source, target=target: GLib.idle_add(
+                    self._on_rendered, future, source, target
+                )
+            )
+        self._executor.shutdown(wait=False)
+        return self.total
+
+    def cancel(self):
+        """Stop exporting; no more callbacks are made after this."""
+        self.cancelled = True
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self.webview_pool.close()
+
+    def _on_rendered(self, future, source, target):
+        if self.cancelled:
+            return False
+        try:
+            documents = future.result()
+        except Exception as e:
+            self._file_done(source, e)
+            return False
+
+        stages = [fmt for fmt in ("pdf", "png") if fmt in self.formats]
+        if not stages:
+            self._file_done(source, None)
+            return False
+
+        self.webview_pool.acquire(
+            lambda webview: self._run_stages(webview, documents, source, target, stages)
+        )
+        return False
+
+    def _run_stages(self, webview, documents, source, target, stages):
+        """Load each needed page into the view and export it, in turn."""
+        if self.cancelled or not stages:
+            self.webview_pool.release(webview)
+            self._file_done(source, None)
+            return
+
+        fmt = stages[0]
+        html_content = documents[self.themes[fmt]]
+
+        def next_stage(error=None):
+            if error is not None:
+                self.webview_pool.release(webview)
+                self._file_done(source, error)
+            else:
+                self._run_stages(webview, documents, source, target, stages[1:])
+
+        def on_loaded():
+            def settle():
+                try:
+                    if fmt == "pdf":
+                        self._print_pdf(webview, f"{target}.pdf", next_stage)
+                    else:
+                        self._snapshot_png(webview, f"{target}.png", next_stage)
+                except Exception as e:
+                    next_stage(e)
+                return False
+
+            GLib.timeout_add(SETTLE_DELAY, settle)
+
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        webview.on_loaded = on_loaded
+        webview.load_html(html_content, "file:///")
+
+    def _print_pdf(self, webview, path: str, done):
+        print_op = WebKit.PrintOperation.new(webview)
+
+        page_setup = Gtk.PageSetup()
+        page_setup.set_paper_size(Gtk.PaperSize.new(Gtk.PAPER_NAME_A4))
+        for set_margin in (
+            page_setup.set_top_margin,
+            page_setup.set_bottom_margin,
+            page_setup.set_left_margin,
+            page_setup.set_right_margin,
+        ):
+            set_margin(15, Gtk.Unit.MM)
+
+        print_settings = Gtk.PrintSettings()
+        print_settings.set_printer("Print to File")
+        print_settings.set(Gtk.PRINT_SETTINGS_OUTPUT_URI, f"file://{path}")
+        print_settings.set(Gtk.PRINT_SETTINGS_OUTPUT_FILE_FORMAT, "pdf")
+        print_settings.set_use_color(True)
+        print_settings.set_quality(Gtk.PrintQuality.HIGH)
+
+        print_op.set_page_setup(page_setup)
+        print_op.set_print_settings(print_settings)
+
+        # A failed print emits "failed" and then "finished"; only the first
+        # may move the job on, or the view would be released twice
+        reported = False
+
+        def report(error=None):
+            nonlocal reported
+            if not reported:
+                reported = True
+                done(error)
+
+        print_op.connect("finished", lambda op: report())
+        print_op.connect(
+            "failed",
+            lambda op, error: report(RuntimeError(error.message if error else "print failed")),
+        )
+        # Print straight to the file, without a dialog
+        (getattr(print_op, "print_", None) or getattr(print_op, "print"))()
+
+    def _snapshot_png(self, webview, path: str, done):
+        def on_snapshot_ready(source, result, user_data):
+            try:
+                texture = webview.get_snapshot_finish(result)
+                if not texture.save_to_png(path):
+                    raise RuntimeError("could not save image")
+            except Exception as e:
+                done(e)
+                return
+            done()
+
+        webview.get_snapshot(
+            WebKit.SnapshotRegion.FULL_DOCUMENT,
+            WebKit.SnapshotOptions.NONE,
+            None,
+            on_snapshot_ready,
+            None,
+        )
+
+    def _file_done(self, source: str, error):
+        if self.cancelled:
+            return
+        self.done += 1
+        if error is not None:
+            print(f"Error exporting {source}: {error}")
+            self.failed.append((source, str(error)))
+        self.on_progress(self.done, self.total, source, error)
+        if self.done == self.total:
+            self._finish()
+
+    def _finish(self):
+        self.webview_pool.close()
+        self.on_finished(self.failed)
+        return False
@@ -0,0 +1,75 @@
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+def digest(text: str) -> str:
+    """Return a collision-safe cache key for text."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class RenderCache:
+    """Thread-safe LRU cache of rendered fragments with a memory budget.
+
+    Entries are charged by their in-memory size and the least recently
+    used ones are evicted once the total goes over max_bytes.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, value: str):
+        cost = sys.getsizeof(key) + sys.getsizeof(value)
+        if cost > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self._entries[key] = (value, cost)
+            self.size += cost
+
+            while self.size > self.max_bytes:
+                _, (_, evicted_cost) = self._entries.popitem(last=False)
+                self.size -= evicted_cost
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Return the counters, for diagnostics."""
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,223 @@
+"""Headless `propad render` command.
+
+Converts Markdown files to standalone HTML with the same pipeline as the
+HTML export, without GTK or a display. The Markdown is rendered and
+post-processed as in the preview, but the page is the export's: the
+preview stylesheet with the export palette, and Mermaid and MathJax from
+their CDN rather than the vendored copies, so it can look different from
+the preview.
+"""
+
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+MARKDOWN_EXTENSIONS = (".md", ".markdown", ".mdown", ".mkd")
+
+# One pipeline per worker process, so the page head is built once
+_pipeline = None
+
+
+def _worker_pipeline():
+    """Return this process's RenderPipeline, creating it on first use."""
+    global _pipeline
+    if _pipeline is None:
+        from propad.render import RenderPipeline
+
+        _pipeline = RenderPipeline()
+    return _pipeline
+
+
+def _write_output(target: str, content: str):
+    """Write content to target atomically, creating its directory."""
+    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+    tmp_path = f"{target}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, target)
+
+
+def _render_file(source: str, target: str, is_dark: bool):
+    """Render one file; runs in a pool process. Returns bytes read."""
+    with open(source, "r", encoding="utf-8") as f:
+        text = f.read()
+    _write_output(target, _worker_pipeline().document(text, is_dark))
+    return len(text.encode("utf-8"))
+
+
+def render_documents(source: str, html_target, themes):
+    """Render one file for the batch export; runs in a pool process.
+
+    Writes the HTML export when html_target is set and returns the
+    documents needed by the offscreen stages, keyed by dark theme flag.
+    """
+    with open(source, "r", encoding="utf-8") as f:
+        text = f.read()
+    pipeline = _worker_pipeline()
+
+    if html_target:
+        _write_output(html_target, pipeline.document(text, themes["html"]))
+    return {
+        is_dark: pipeline.document(text, is_dark)
+        for fmt, is_dark in themes.items()
+        if fmt != "html"
+    }
+
+
+def _glob_root(pattern: str) -> str:
+    """Return the directories of pattern before its first wildcard."""
+    parts = []
+    for part in pattern.split("/"):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return "/".join(parts) or ("/" if pattern.startswith("/") else ".")
+
+
+def collect_sources(paths):
+    """Expand files, globs and directories to (source, relative name) pairs.
+
+    Files under a directory keep their path relative to it, and glob
+    matches their path relative to the part of the pattern before the
+    first wildcard; files named directly are placed by base name.
+    """
+    sources = []
+    seen = set()
+
+    def add(path, name):
+        real = os.path.realpath(path)
+        if real not in seen:
+            seen.add(real)
+            sources.append((path, name))
+
+    for pattern in paths:
+        is_glob = glob.has_magic(pattern)
+        matches = glob.glob(pattern, recursive=True) if is_glob else [pattern]
+        if not matches:
+            print(f"propad render: no match for {pattern}", file=sys.stderr)
+        root = _glob_root(pattern) if is_glob else None
+        for path in sorted(matches):
+            if os.path.isdir(path):
+                for dirpath, dirnames, filenames in os.walk(path):
+                    dirnames.sort()
+                    for filename in sorted(filenames):
+                        if filename.lower().endswith(MARKDOWN_EXTENSIONS):
+                            full_path = os.path.join(dirpath, filename)
+                            add(full_path, os.path.relpath(full_path, root or path))
+            elif os.path.isfile(path):
+                add(path, os.path.relpath(path, root) if root else os.path.basename(path))
+            elif not glob.has_magic(pattern):
+                print(f"propad render: {path} does not exist", file=sys.stderr)
+    return sources
+
+
+def output_targets(sources, output_dir: str):
+    """Map (source, name) pairs to output paths without extension.
+
+    Returns (targets, clashes): targets pairs each source with its output
+    path, and clashes lists (source, earlier source) for sources that
+    would overwrite an earlier one's output, e.g. a.md and a.markdown.
+    """
+    targets = []
+    clashes = []
+    owners = {}
+    for source, name in sources:
+        target = os.path.join(output_dir, os.path.splitext(name)[0])
+        owner = owners.setdefault(os.path.normcase(os.path.normpath(target)), source)
+        if owner is not source:
+            clashes.append((source, owner))
+        else:
+            targets.append((source, target))
+    return targets, clashes
+
+
+def render_command(argv) -> int:
+    """Run `propad render`; returns the process exit status."""
+    parser = argparse.ArgumentParser(
+        prog="propad render",
+        description="Render Markdown files to standalone HTML like the HTML export.",
+        epilog=(
+            "The pages use the export palette and load Mermaid and MathJax from "
+            "their CDN, so they can differ from the in-app preview."
+        ),
+    )
+    parser.add_argument(
+        "paths", nargs="+", help="Markdown files, glob patterns or directories"
+    )
+    parser.add_argument(
+        "-o", "--output", default=".", help="output directory (default: current)"
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=None, help="worker processes (default: CPUs)"
+    )
+    parser.add_argument("--dark", action="store_true", help="use the dark theme")
+    parser.add_argument(
+        "-q", "--quiet", action="store_true", help="only print errors and the summary"
+    )
+    args = parser.parse_args(argv)
+
+    sources = collect_sources(args.paths)
+    if not sources:
+        print("propad render: nothing to render", file=sys.stderr)
+        return 1
+
+    targets, clashes = output_targets(sources, args.output)
+    if clashes:
+        for source, owner in clashes:
+            print(
+                f"propad render: {source} and {owner} would be written to the same file",
+                file=sys.stderr,
+            )
+        return 2
+    jobs = [(source, f"{target}.html") for source, target in targets]
+
+    started = time.perf_counter()
+    rendered = 0
+    failed = 0
+    total_bytes = 0
+
+    # Forked workers start right away, without importing anything again
+    mp_context = None
+    if "fork" in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context("fork")
+
+    with ProcessPoolExecutor(max_workers=args.jobs, mp_context=mp_context) as executor:
+        futures = {
+            executor.submit(_render_file, source, target, args.dark): (source, target)
+            for source, target in jobs
+        }
+        # Report each file as soon as it is done
+        for future in as_completed(futures):
+            source, target = futures[future]
+            try:
+                total_bytes += future.result()
+            except Exception as e:
+                failed += 1
+                print(f"FAILED {source}: {e}", file=sys.stderr)
+                continue
+            rendered += 1
+            if not args.quiet:
+                print(f"{source} -> {target}", flush=True)
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    megabytes = total_bytes / (1024 * 1024)
+    print(
+        f"Rendered {rendered} file(s), {failed} failed, {megabytes:.2f} MB "
+        f"in {elapsed:.2f}s ({rendered / elapsed:.1f} files/s, "
+        f"{megabytes / elapsed:.2f} MB/s)"
+    )
+    return 1 if failed else 0
+
+
+def main(argv=None) -> int:
+    """Entry point for `propad <command>` invocations that need no display."""
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] == "render":
+        return render_command(argv[1:])
+    print(f"propad: unknown command {argv[0] if argv else ''}", file=sys.stderr)
+    return 2
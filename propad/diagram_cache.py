@@ -0,0 +1,91 @@
+import hashlib
+import html
+import os
+import re
+from typing import Optional
+
+CACHE_DIR = os.path.expanduser("~/.cache/propad/mermaid")
+MAX_ENTRIES = 500
+
+# Diagram placeholders as emitted by the preview post-processing: the
+# source is escaped in both places, so the body contains no markup
+_DIAGRAM_RE = re.compile(r'<div class="mermaid" data-source="([^"]*)">[^<]*</div>')
+
+
+class DiagramCache:
+    """Rendered Mermaid SVGs keyed by diagram source and theme.
+
+    Entries live in memory for the session and as one file each on disk,
+    so diagrams survive page reloads and restarts without another layout.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._memory = {}
+
+    @staticmethod
+    def key(source: str, theme: str) -> str:
+        data = f"{theme}\0{source}".encode("utf-8")
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.svg")
+
+    def get(self, source: str, theme: str) -> Optional[str]:
+        key = self.key(source, theme)
+        svg = self._memory.get(key)
+        if svg is None:
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    svg = f.read()
+            except OSError:
+                return None
+            self._memory[key] = svg
+        return svg
+
+    def put(self, source: str, theme: str, svg: str):
+        key = self.key(source, theme)
+        if self._memory.get(key) == svg:
+            return
+        self._memory[key] = svg
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(key)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(svg)
+            os.replace(tmp_path, path)
+            self._prune()
+        except OSError as e:
+            print(f"Error saving diagram cache: {e}")
+
+    def _prune(self):
+        """Drop the least recently written files over MAX_ENTRIES."""
+        entries = [
+            entry
+            for entry in os.scandir(self.cache_dir)
+            if entry.name.endswith(".svg")
+        ]
+        if len(entries) <= MAX_ENTRIES:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[: len(entries) - MAX_ENTRIES]:
+            self._memory.pop(entry.name[:-4], None)
+            os.remove(entry.path)
+
+    def inline(self, html_content: str, theme: str) -> str:
+        """Swap diagram placeholders for cached SVGs where available."""
+        if 'class="mermaid"' not in html_content:
+            return html_content
+
+        def replace_diagram(match):
+            svg = self.get(html.unescape(match.group(1)), theme)
+            if svg is None:
+                return match.group(0)
+            return (
+                f'<div class="mermaid" data-source="{match.group(1)}" '
+                f'data-theme="{theme}" data-processed="true">{svg}</div>'
+            )
+
+        return _DIAGRAM_RE.sub(replace_diagram, html_content)
@@ -0,0 +1,79 @@
+"""Unsaved editor text, kept out of state.json.
+
+Each draft is a zlib-compressed file named after a digest of its key,
+which is the document's path or an untitled id. Drafts are only read when
+asked for, and written by a background thread.
+"""
+
+import os
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from propad.cache import digest
+
+DRAFTS_DIR = os.path.expanduser("~/.config/propad/drafts")
+# zlib level: fast, and Markdown still shrinks to a fraction
+COMPRESS_LEVEL = 6
+UNTITLED_PREFIX = "untitled:"
+
+
+def new_untitled_key() -> str:
+    """Return a draft key for a document that has no file yet."""
+    return f"{UNTITLED_PREFIX}{uuid.uuid4().hex}"
+
+
+class DraftStore:
+    """Compressed drafts on disk, one file per key."""
+
+    def __init__(self, drafts_dir: str = DRAFTS_DIR):
+        self.drafts_dir = drafts_dir
+        # One writer thread, so saves land in order
+        self._writer = ThreadPoolExecutor(max_workers=1)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.drafts_dir, f"{digest(key)}.md.z")
+
+    def load(self, key: str):
+        """Return the draft for key, or None if there is none."""
+        try:
+            with open(self._path(key), "rb") as f:
+                return zlib.decompress(f.read()).decode("utf-8")
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Error loading draft: {e}")
+            return None
+
+    def save(self, key: str, text: str):
+        """Write the draft for key in the background."""
+        self._writer.submit(self._write, self._path(key), text)
+
+    def remove(self, key: str):
+        """Delete the draft for key in the background."""
+        self._writer.submit(self._delete, self._path(key))
+
+    def flush(self):
+        """Wait until every queued write has landed."""
+        self._writer.submit(lambda: None).result()
+
+    @staticmethod
+    def _write(path: str, text: str):
+        try:
+            data = zlib.compress(text.encode("utf-8"), COMPRESS_LEVEL)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error saving draft: {e}")
+
+    @staticmethod
+    def _delete(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error removing draft: {e}")
@@ -1,7 +1,6 @@
 import gi
 import os
 import tempfile
-import re
 import threading
 from concurrent.futures import ThreadPoolExecutor
 
@@ -11,8 +10,9 @@ gi.require_version("WebKit", "6.0")
 gi.require_version("Gdk", "4.0")
 
 from gi.repository import Gtk, Adw, Gio, WebKit, GLib, Gdk
-import comrak
 from propad.i18n import _
+from propad.render import RenderPipeline
+from propad.batch_export import BatchExporter
 
 
 UI_FILE = "ui/export_dialog.ui"
@@ -29,6 +29,11 @@ class ExportDialog(Adw.Window):
     check_include_css = Gtk.Template.Child()
     check_standalone = Gtk.Template.Child()
     dropdown_image_format = Gtk.Template.Child()
+    check_batch_html = Gtk.Template.Child()
+    check_batch_pdf = Gtk.Template.Child()
+    check_batch_image = Gtk.Template.Child()
+    btn_batch_export = Gtk.Template.Child()
+    batch_progress = Gtk.Template.Child()
 
     def __init__(self, parent_window, **kwargs):
         super().__init__(**kwargs)
@@ -38,26 +43,22 @@ class ExportDialog(Adw.Window):
         # Thread pool for parallel processing
         self._thread_pool = ThreadPoolExecutor(max_workers=4)
 
-        # Cache for loaded external files
-        self._file_cache = {}
+        # Share the window's pipeline so its cached stages are reused
+        self.render_pipeline = (
+            getattr(parent_window, "render_pipeline", None) or RenderPipeline()
+        )
 
-        self._preload_external_files()
+        self._batch_exporter = None
 
         self._setup_webkit_context()
 
-        self.extension_options = comrak.ExtensionOptions()
-        self.extension_options.table = True
-        self.extension_options.strikethrough = True
-        self.extension_options.autolink = True
-        self.extension_options.tasklist = True
-        self.extension_options.superscript = True
-        self.extension_options.footnotes = True
-
         # Connect signals
         self.btn_export_html.connect("clicked", self._on_export_html)
         self.btn_export_pdf.connect("clicked", self._on_export_pdf)
         self.btn_export_image.connect("clicked", self._on_export_image)
+        self.btn_batch_export.connect("clicked", self._on_batch_export)
         self.btn_close.connect("clicked", lambda b: self.close())
+        self.connect("close-request", self._on_close_request)
 
     def _setup_webkit_context(self):
         try:
@@ -84,223 +85,27 @@ class ExportDialog(Adw.Window):
             print(f"Note: WebKit context configuration skipped: {e}")
             # Continue anyway - the environment variables should work
 
-    def _preload_external_files(self):
-        """Pre-load external files in background thread for faster access."""
-
-        def load_files():
-            files_to_load = [
-                "assets/styles.css",
-                "assets/mermaid-loader.js",
-                "assets/mathjax-config.js",
-                "assets/mathjax-render.js",
-            ]
-            for filename in files_to_load:
-                if filename not in self._file_cache:
-                    self._file_cache[filename] = self._load_external_file(filename)
-
-        # Load in background
-        self._thread_pool.submit(load_files)
-
     def get_markdown_content(self):
         if self.parent_window:
             sidebar = self.parent_window.get_sidebar()
             return sidebar.get_text()
         return ""
 
-    def _load_external_file(self, filename):
-        try:
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            file_path = os.path.join(script_dir, filename)
-            with open(file_path, "r", encoding="utf-8") as f:
-                return f.read()
-        except Exception as e:
-            print(f"Error loading {filename}: {e}")
-            return ""
-
     def get_html_content(self):
         markdown = self.get_markdown_content()
-        html = comrak.render_markdown(
-            markdown, extension_options=self.extension_options
-        )
-        return html
+        return self.render_pipeline.fragment(markdown)
 
     def get_full_html_document_from_webview(self, for_pdf=False):
         if not self.parent_window:
             return ""
 
         markdown = self.get_markdown_content()
-        html = comrak.render_markdown(
-            markdown, extension_options=self.extension_options
-        )
-
-        def process_mermaid_blocks(html_content):
-            patterns = [
-                re.compile(
-                    r'<pre><code class="language-mermaid">(.*?)</code></pre>', re.DOTALL
-                ),
-                re.compile(r'<pre lang="mermaid"><code>(.*?)</code></pre>', re.DOTALL),
-                re.compile(r'<code class="language-mermaid">(.*?)</code>', re.DOTALL),
-                re.compile(r"```mermaid\s*(.*?)\s*```", re.DOTALL),
-            ]
-
-            def replace_mermaid(match):
-                mermaid_code = match.group(1).strip()
-                mermaid_code = (
-                    mermaid_code.replace("&lt;", "<")
-                    .replace("&gt;", ">")
-                    .replace("&amp;", "&")
-                    .replace("&quot;", '"')
-                )
-                return f'<div class="mermaid">\n{mermaid_code}\n</div>'
-
-            result = html_content
-            for pattern in patterns:
-                result = pattern.sub(replace_mermaid, result)
-            return result
-
-        # Process GitHub alerts (same as webview.py)
-        def process_github_alerts(html_content):
-            alert_pattern = re.compile(
-                r"<blockquote>\s*<p>\[!(NOTE|TIP|IMPORTANT|WARNING|CAUTION)\]\s*(.*?)</p>(.*?)</blockquote>",
-                re.DOTALL | re.IGNORECASE,
-            )
-
-            def replace_alert(match):
-                alert_type = match.group(1).upper()
-                first_line = match.group(2).strip()
-                rest_content = match.group(3).strip()
-                full_content = first_line
-                if rest_content:
-                    full_content += rest_content
-                return f'<div class="alert alert-{alert_type.lower()}" data-alert-type="{alert_type}">{full_content}</div>'
-
-            return alert_pattern.sub(replace_alert, html_content)
-
-        processed_html = process_mermaid_blocks(html)
-        processed_html = process_github_alerts(processed_html)
-
         is_dark = (
             False
             if for_pdf
             else (self.parent_window.is_dark_mode() if self.parent_window else False)
         )
-
-        def load_external_file(filename):
-            try:
-                script_dir = os.path.dirname(os.path.abspath(__file__))
-                file_path = os.path.join(script_dir, filename)
-                with open(file_path, "r", encoding="utf-8") as f:
-                    return f.read()
-            except Exception as e:
-                print(f"Error loading {filename}: {e}")
-                return ""
-
-        # Use cached files if available, otherwise load
-        css_content = self._file_cache.get("assets/styles.css") or load_external_file(
-            "assets/styles.css"
-        )
-        js_mermaid = self._file_cache.get(
-            "assets/mermaid-loader.js"
-        ) or load_external_file("assets/mermaid-loader.js")
-        js_mathjax_config = self._file_cache.get(
-            "assets/mathjax-config.js"
-        ) or load_external_file("assets/mathjax-config.js")
-        js_mathjax_render = self._file_cache.get(
-            "assets/mathjax-render.js"
-        ) or load_external_file("assets/mathjax-render.js")
-
-        # Theme colors
-        bg_color = "#1e1e1e" if is_dark else "#ffffff"
-        text_color = "#d4d4d4" if is_dark else "#1e1e1e"
-        link_color = "#4fc3f7" if is_dark else "#0066cc"
-        code_bg = "#2d2d2d" if is_dark else "#f5f5f5"
-        pre_bg = "#2d2d2d" if is_dark else "#f5f5f5"
-        border_color = "#333333" if is_dark else "#e1e4e8"
-        mermaid_theme = "dark" if is_dark else "default"
-
-        # Alert colors
-        if is_dark:
-            note_bg, note_border, note_icon = "#1f2937", "#3b82f6", "#3b82f6"
-            tip_bg, tip_border, tip_icon = "#1e3a2e", "#10b981", "#10b981"
-            important_bg, important_border, important_icon = (
-                "#3a2e42",
-                "#a855f7",
-                "#a855f7",
-            )
-            warning_bg, warning_border, warning_icon = "#3a2e1e", "#f59e0b", "#f59e0b"
-            caution_bg, caution_border, caution_icon = "#3a1e1e", "#ef4444", "#ef4444"
-        else:
-            note_bg, note_border, note_icon = "#dbeafe", "#3b82f6", "#1e40af"
-            tip_bg, tip_border, tip_icon = "#d1fae5", "#10b981", "#065f46"
-            important_bg, important_border, important_icon = (
-                "#f3e8ff",
-                "#a855f7",
-                "#6b21a8",
-            )
-            warning_bg, warning_border, warning_icon = "#fef3c7", "#f59e0b", "#92400e"
-            caution_bg, caution_border, caution_icon = "#fee2e2", "#ef4444", "#991b1b"
-
-        # Replace CSS variables
-        css_with_theme = (
-            css_content.replace("{bg_color}", bg_color)
-            .replace("{text_color}", text_color)
-            .replace("{link_color}", link_color)
-            .replace("{code_bg}", code_bg)
-            .replace("{pre_bg}", pre_bg)
-            .replace("{border_color}", border_color)
-            .replace("{note_bg}", note_bg)
-            .replace("{note_border}", note_border)
-            .replace("{note_icon}", note_icon)
-            .replace("{tip_bg}", tip_bg)
-            .replace("{tip_border}", tip_border)
-            .replace("{tip_icon}", tip_icon)
-            .replace("{important_bg}", important_bg)
-            .replace("{important_border}", important_border)
-            .replace("{important_icon}", important_icon)
-            .replace("{warning_bg}", warning_bg)
-            .replace("{warning_border}", warning_border)
-            .replace("{warning_icon}", warning_icon)
-            .replace("{caution_bg}", caution_bg)
-            .replace("{caution_border}", caution_border)
-            .replace("{caution_icon}", caution_icon)
-        )
-
-        # Replace JS variables
-        js_mermaid_with_theme = js_mermaid.replace("{mermaid_theme}", mermaid_theme)
-
-        # Build complete HTML document
-        html_doc = f"""<!DOCTYPE html>
-<html>
-<head>
-<meta charset="UTF-8">
-<meta name="viewport" content="width=device-width, initial-scale=1.0">
-<title>Exported Document</title>
-<style id="theme-style">
-{css_with_theme}
-</style>
-
-<!-- Mermaid for diagrams (Latest Version v11) -->
-<script type="module">
-{js_mermaid_with_theme}
-</script>
-
-<!-- MathJax for LaTeX -->
-<script>
-{js_mathjax_config}
-</script>
-<script propad="https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-mml-chtml.js"></script>
-
-<!-- Ensure MathJax renders after page load -->
-<script>
-{js_mathjax_render}
-</script>
-</head>
-<body>
-{processed_html}
-</body>
-</html>"""
-
-        return html_doc
+        return self.render_pipeline.document(markdown, is_dark=is_dark)
 
     def _on_export_html(self, button):
         """Export as HTML - Fixed version."""
@@ -648,6 +453,104 @@ class ExportDialog(Adw.Window):
         webview.connect("load-changed", on_load_finished)
         webview.load_html(html_content, "file:///")
 
+    def _on_batch_export(self, button):
+        """Pick a folder of Markdown files, then where to export it."""
+        formats = []
+        if self.check_batch_html.get_active():
+            formats.append("html")
+        if self.check_batch_pdf.get_active():
+            formats.append("pdf")
+        if self.check_batch_image.get_active():
+            formats.append("png")
+        if not formats:
+            self._show_error_message(
+                "Export Failed", "Choose at least one format for the batch export"
+            )
+            return
+
+        dialog = Gtk.FileDialog()
+        dialog.set_title(_("Folder to Export"))
+        dialog.select_folder(self, None, self._on_batch_source_response, formats)
+
+    def _on_batch_source_response(self, dialog, result, formats):
+        try:
+            source = dialog.select_folder_finish(result)
+        except GLib.Error as e:
+            if e.code != Gtk.DialogError.DISMISSED:
+                self._show_error_message("Export Failed", e.message)
+            return
+
+        output_dialog = Gtk.FileDialog()
+        output_dialog.set_title(_("Export To"))
+        output_dialog.set_initial_folder(source)
+        output_dialog.select_folder(
+            self,
+            None,
+            self._on_batch_output_response,
+            (source.get_path(), formats),
+        )
+
+    def _on_batch_output_response(self, dialog, result, user_data):
+        source_dir, formats = user_data
+        try:
+            output_dir = dialog.select_folder_finish(result).get_path()
+        except GLib.Error as e:
+            if e.code != Gtk.DialogError.DISMISSED:
+                self._show_error_message("Export Failed", e.message)
+            return
+
+        is_dark = self.parent_window.is_dark_mode() if self.parent_window else False
+        self._batch_exporter = BatchExporter(
+            source_dir,
+            output_dir,
+            formats,
+            self._on_batch_progress,
+            self._on_batch_finished,
+            is_dark=is_dark,
+        )
+        self.btn_batch_export.set_sensitive(False)
+        self.batch_progress.set_fraction(0.0)
+        self.batch_progress.set_text(_("Rendering…"))
+        self.batch_progress.set_visible(True)
+        self._batch_exporter.start()
+
+    def _on_batch_progress(self, done, total, source, error):
+        self.batch_progress.set_fraction(done / total)
+        status = _("failed") if error is not None else _("done")
+        self.batch_progress.set_text(
+            f"{done}/{total} · {os.path.basename(source)} {status}"
+        )
+
+    def _on_batch_finished(self, failed):
+        exporter = self._batch_exporter
+        self._batch_exporter = None
+        self.btn_batch_export.set_sensitive(True)
+        self.batch_progress.set_visible(False)
+
+        if not exporter.total:
+            self._show_error_message(
+                "Export Failed", "No Markdown files were found in that folder"
+            )
+        elif failed:
+            details = "\n".join(
+                f"{os.path.basename(source)}: {error}" for source, error in failed[:10]
+            )
+            self._show_error_message(
+                "Batch Export Finished With Errors",
+                f"{len(failed)} of {exporter.total} files failed:\n{details}",
+            )
+        else:
+            self._show_success_message(
+                "Batch Export Successful",
+                f"{exporter.total} files exported to:\n{exporter.output_dir}",
+            )
+
+    def _on_close_request(self, window):
+        if self._batch_exporter is not None:
+            self._batch_exporter.cancel()
+            self._batch_exporter = None
+        return False
+
     def _show_success_message(self, heading, body):
         """Show success message dialog."""
         dialog = Adw.MessageDialog.new(self)
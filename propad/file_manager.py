@@ -1,6 +1,9 @@
 import gi
 import os
 import json
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 gi.require_version("Gtk", "4.0")
@@ -9,109 +12,215 @@ gi.require_version("Adw", "1")
 from gi.repository import Gtk, Adw, Gio, GLib
 
 UI_FILE = "ui/file_manager.ui"
+# Pre-SQLite history, imported once
 CONFIG_FILE = os.path.expanduser("~/.config/propad/file_history.json")
+DB_FILE = os.path.expanduser("~/.config/propad/file_history.db")
+# Queued updates are written out together once this many ms have passed
+SAVE_DELAY = 2000
+# Files shown in the recent list
+RECENT_FILES_LIMIT = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    created TEXT,
+    last_opened TEXT,
+    last_edited TEXT,
+    opened_count INTEGER NOT NULL DEFAULT 0,
+    last_used TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_last_used ON files (last_used);
+CREATE INDEX IF NOT EXISTS files_last_opened ON files (last_opened);
+CREATE INDEX IF NOT EXISTS files_last_edited ON files (last_edited);
+CREATE TABLE IF NOT EXISTS file_tags (
+    path TEXT NOT NULL REFERENCES files (path) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (path, tag)
+);
+CREATE INDEX IF NOT EXISTS file_tags_tag ON file_tags (tag);
+"""
+
+UPSERT_FILE = """
+INSERT INTO files (path, created, last_opened, last_edited, opened_count, last_used)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (path) DO UPDATE SET
+    created = COALESCE(files.created, excluded.created),
+    last_opened = COALESCE(excluded.last_opened, files.last_opened),
+    last_edited = COALESCE(excluded.last_edited, files.last_edited),
+    opened_count = files.opened_count + excluded.opened_count,
+    last_used = excluded.last_used
+"""
 
 
 class FileHistory:
-    
-
-    def __init__(self):
-        self.history = self.load_history()
-
-    def load_history(self):
-        
+    """Recently used files, stored in SQLite.
+
+    Updates are queued in memory and written together in one transaction
+    by a background thread once SAVE_DELAY has passed; flush() writes them
+    at once, e.g. on shutdown. Queries flush first. Every window keeps its
+    own connection and WAL mode lets them share the database safely.
+    """
+
+    def __init__(self, db_file: str = DB_FILE):
+        self.db_file = db_file
+        self._pending = []
+        self._save_timer_id = None
+        # One writer thread, so saves land in order
+        self._writer = ThreadPoolExecutor(max_workers=1)
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        self._db = sqlite3.connect(db_file, timeout=5, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        with self._db:
+            self._db.executescript(SCHEMA)
+            if self._db.execute("PRAGMA user_version").fetchone()[0] == 0:
+                self._import_json(CONFIG_FILE)
+                self._db.execute("PRAGMA user_version = 1")
+
+    def _import_json(self, path: str):
+        """Carry over the history from the old JSON file."""
         try:
-            if os.path.exists(CONFIG_FILE):
-                with open(CONFIG_FILE, "r") as f:
-                    return json.load(f)
+            with open(path, "r") as f:
+                history = json.load(f)
+        except FileNotFoundError:
+            return
         except Exception as e:
             print(f"Error loading history: {e}")
+            return
 
-        return {
-            "files": {},  
-            "order": [],  
-        }
+        files = history.get("files", {})
+        for filepath in reversed(history.get("order", [])):
+            data = files.get(filepath)
+            if data is None:
+                continue
+            stamps = [
+                data.get(key) or ""
+                for key in ("created", "last_opened", "last_edited")
+            ]
+            self._db.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    filepath,
+                    data.get("created"),
+                    data.get("last_opened"),
+                    data.get("last_edited"),
+                    data.get("opened_count", 0),
+                    max(stamps),
+                ),
+            )
+            for tag in data.get("tags", []):
+                self._db.execute(
+                    "INSERT OR IGNORE INTO file_tags (path, tag) VALUES (?, ?)",
+                    (filepath, tag),
+                )
 
     def save_history(self):
-        
+        """Schedule a write of the queued updates."""
+        if self._save_timer_id is None:
+            self._save_timer_id = GLib.timeout_add(SAVE_DELAY, self._on_save_timeout)
+
+    def _on_save_timeout(self):
+        self._save_timer_id = None
+        self.flush(wait=False)
+        return False
+
+    def flush(self, wait: bool = True):
+        """Write queued updates now; in the background unless wait."""
+        if self._save_timer_id is not None:
+            GLib.source_remove(self._save_timer_id)
+            self._save_timer_id = None
+
+        pending = self._pending
+        self._pending = []
+        future = self._writer.submit(self._write, pending) if pending else None
+        if wait and future is not None:
+            future.result()
+
+    def _write(self, updates):
         try:
-            os.makedirs(os.path.dirname(CONFIG_FILE), exist_ok=True)
-            with open(CONFIG_FILE, "w") as f:
-                json.dump(self.history, f, indent=2)
+            with self._lock, self._db:
+                for filepath, action, now in updates:
+                    self._db.execute(
+                        UPSERT_FILE,
+                        (
+                            filepath,
+                            now if action == "created" else None,
+                            now if action == "opened" else None,
+                            now if action == "edited" else None,
+                            1 if action == "opened" else 0,
+                            now,
+                        ),
+                    )
+                    self._db.execute(
+                        "INSERT OR IGNORE INTO file_tags (path, tag) VALUES (?, ?)",
+                        (filepath, action),
+                    )
         except Exception as e:
             print(f"Error saving history: {e}")
 
     def add_file(self, filepath, action="opened"):
-        
         now = datetime.now().isoformat()
-
-        if filepath not in self.history["files"]:
-            # New file
-            self.history["files"][filepath] = {
-                "created": now if action == "created" else None,
-                "last_opened": now if action == "opened" else None,
-                "last_edited": now if action == "edited" else None,
-                "opened_count": 1 if action == "opened" else 0,
-                "tags": [action],
-            }
+        if self._pending and self._pending[-1][:2] == (filepath, action) and action != "opened":
+            # Repeated edits only move the timestamp
+            self._pending[-1] = (filepath, action, now)
         else:
-            
-            file_data = self.history["files"][filepath]
-
-            if action == "opened":
-                file_data["last_opened"] = now
-                file_data["opened_count"] = file_data.get("opened_count", 0) + 1
-            elif action == "edited":
-                file_data["last_edited"] = now
-            elif action == "created":
-                if not file_data.get("created"):
-                    file_data["created"] = now
-
-            
-            if action not in file_data.get("tags", []):
-                if "tags" not in file_data:
-                    file_data["tags"] = []
-                file_data["tags"].append(action)
-
-        
-        if filepath in self.history["order"]:
-            self.history["order"].remove(filepath)
-        self.history["order"].insert(0, filepath)
-
-       
-        self.history["order"] = self.history["order"][:50]
-
-        
-        files_to_remove = [
-            f for f in self.history["files"] if f not in self.history["order"]
-        ]
-        for f in files_to_remove:
-            del self.history["files"][f]
-
+            self._pending.append((filepath, action, now))
         self.save_history()
 
     def remove_file(self, filepath):
-        
-        if filepath in self.history["files"]:
-            del self.history["files"][filepath]
-        if filepath in self.history["order"]:
-            self.history["order"].remove(filepath)
-        self.save_history()
+        self.flush()
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM files WHERE path = ?", (filepath,))
 
     def clear_history(self):
-        
-        self.history = {"files": {}, "order": []}
-        self.save_history()
-
-    def get_files(self):
-        """Get list of files in order with metadata."""
-        result = []
-        for filepath in self.history["order"]:
-            if filepath in self.history["files"]:
-                data = self.history["files"][filepath].copy()
-                data["filepath"] = filepath
-                result.append(data)
-        return result
+        self._pending = []
+        self.flush()
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM files")
+
+    def get_files(self, limit=None, offset=0, tag=None):
+        """Get files, most recently used first, with metadata.
+
+        limit and offset page through the history; tag keeps only files
+        carrying that tag.
+        """
+        self.flush()
+        query = (
+            "SELECT path, created, last_opened, last_edited, opened_count FROM files"
+        )
+        params = []
+        if tag is not None:
+            query += " WHERE path IN (SELECT path FROM file_tags WHERE tag = ?)"
+            params.append(tag)
+        query += " ORDER BY last_used DESC LIMIT ? OFFSET ?"
+        params += [-1 if limit is None else limit, offset]
+
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+            tags = {}
+            if rows:
+                placeholders = ",".join("?" * len(rows))
+                for path, file_tag in self._db.execute(
+                    f"SELECT path, tag FROM file_tags WHERE path IN ({placeholders}) "
+                    "ORDER BY rowid",
+                    [row[0] for row in rows],
+                ):
+                    tags.setdefault(path, []).append(file_tag)
+
+        return [
+            {
+                "filepath": path,
+                "created": created,
+                "last_opened": last_opened,
+                "last_edited": last_edited,
+                "opened_count": opened_count,
+                "tags": tags.get(path, []),
+            }
+            for path, created, last_opened, last_edited, opened_count in rows
+        ]
 
 
 @Gtk.Template(filename=UI_FILE)
@@ -133,7 +242,10 @@ class FileManagerDialog(Adw.Window):
         self.parent_window = parent_window
 
         self.current_file = None
-        self.file_history = FileHistory()
+        # Share the window's history so unsaved changes are visible here
+        self.file_history = (
+            getattr(parent_window, "file_history", None) or FileHistory()
+        )
 
        
         self.btn_new.connect("clicked", self._on_new_clicked)
@@ -174,7 +286,7 @@ class FileManagerDialog(Adw.Window):
             self.listbox_recent.remove(row)
 
        
-        files = self.file_history.get_files()
+        files = self.file_history.get_files(limit=RECENT_FILES_LIMIT)
         for file_data in files:
             filepath = file_data["filepath"]
 
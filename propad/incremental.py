@@ -0,0 +1,564 @@
+import re
+from bisect import bisect_left, bisect_right
+from typing import NamedTuple, Optional
+
+import comrak
+
+from propad.cache import RenderCache, digest
+
+
+_FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+_HEADING_RE = re.compile(r"^ {0,3}#{1,6}(?:[ \t]|$)")
+# A marker must be followed by whitespace or the end of the line
+_LIST_RE = re.compile(r"^ {0,3}([*+-]|\d{1,9}[.)])(?:([ \t]+)|$)")
+_REF_DEF_RE = re.compile(
+    r" {0,3}\[(?!\^)[^\[\]\n]*[^\s\[\]][^\[\]\n]*\]:[ \t]*(?:<[^<>\n]*>|[^\s<]\S*)"
+    r"(?:[ \t]+(?:\"[^\"\n]*\"|'[^'\n]*'|\([^()\n]*\)))?[ \t]*\n?"
+)
+_BREAK_RE = re.compile(r"^ {0,3}([-*_])(?:[ \t]*\1){2,}[ \t]*$")
+_TABLE_DELIM_RE = re.compile(
+    r"^ {0,3}(?=[^\n]*\|)\|?[ \t]*:?-+:?[ \t]*(?:\|[ \t]*:?-+:?[ \t]*)*\|?[ \t]*$"
+)
+_SETEXT_RE = re.compile(r"^ {0,3}(?:=+|-+)[ \t]*$")
+_FOOTNOTE_DEF_RE = re.compile(r"^ {0,3}\[\^[^\]\n]+\]:", re.MULTILINE)
+# Anything in brackets might be a reference to a definition
+_BRACKETS_RE = re.compile(r"\[((?:[^\[\]\\]|\\.){1,999})\]", re.DOTALL)
+
+# HTML blocks of kinds 1-5 in the CommonMark spec run until an end marker
+# and may contain blank lines.
+_RAW_HTML_BLOCKS = (
+    (re.compile(r"^ {0,3}<(?:script|pre|style|textarea)(?:\s|>|$)", re.I),
+     re.compile(r"</(?:script|pre|style|textarea)>", re.I)),
+    (re.compile(r"^ {0,3}<!--"), re.compile(r"-->")),
+    (re.compile(r"^ {0,3}<\?"), re.compile(r"\?>")),
+    (re.compile(r"^ {0,3}<![A-Z]"), re.compile(r">")),
+    (re.compile(r"^ {0,3}<!\[CDATA\["), re.compile(r"\]\]>")),
+)
+# Kind 6 may interrupt a paragraph and runs until a blank line.
+_HTML_BLOCK_RE = re.compile(
+    r"^ {0,3}</?(?:address|article|aside|base|basefont|blockquote|body|caption"
+    r"|center|col|colgroup|dd|details|dialog|dir|div|dl|dt|fieldset|figcaption"
+    r"|figure|footer|form|frame|frameset|h[1-6]|head|header|hr|html|iframe"
+    r"|legend|li|link|main|menu|menuitem|nav|noframes|ol|optgroup|option|p"
+    r"|param|search|section|summary|table|tbody|td|tfoot|th|thead|title|tr"
+    r"|track|ul)(?:\s|/?>|$)",
+    re.I,
+)
+
+# Kind 7: any lone open or closing tag, which cannot interrupt a paragraph
+_HTML_TAG_LINE_RE = re.compile(r"^ {0,3}</?[A-Za-z][A-Za-z0-9-]*(?:\s[^<>]*)?/?>[ \t]*$")
+
+_CHUNK = 4096
+
+
+class Block(NamedTuple):
+    """A top-level Markdown block, as offsets into the source text."""
+
+    start: int
+    end: int
+    line: int
+    key: str
+
+
+def _line_end(text: str, pos: int) -> int:
+    end = text.find("\n", pos)
+    return len(text) if end == -1 else end + 1
+
+
+def _indent(line: str) -> int:
+    width = 0
+    for char in line:
+        if char == " ":
+            width += 1
+        elif char == "\t":
+            width += 4 - width % 4
+        else:
+            break
+    return width
+
+
+def _opens_fence(line: str) -> Optional[str]:
+    """Return the fence marker if line opens a fenced code block."""
+    match = _FENCE_RE.match(line)
+    if not match:
+        return None
+    marker = match.group(1)
+    if marker[0] == "`" and "`" in line[match.end():]:
+        return None
+    return marker
+
+
+def _fence_closes(line: str, fence: str) -> bool:
+    stripped = line.strip()
+    return (
+        _indent(line) <= 3
+        and stripped.startswith(fence)
+        and not stripped.strip(fence[0])
+    )
+
+
+def _raw_html_end(line: str):
+    """Return the end marker if line opens a kind 1-5 HTML block."""
+    for start_re, end_re in _RAW_HTML_BLOCKS:
+        match = start_re.match(line)
+        if match:
+            # The end marker may overlap the opener, as in "<?>"
+            if end_re.search(line, match.start()):
+                return None
+            return end_re
+    return None
+
+
+def _opens_block(line: str) -> bool:
+    """Check whether line starts a block that interrupts any paragraph."""
+    return bool(
+        _HEADING_RE.match(line)
+        or _opens_fence(line)
+        or _raw_html_end(line)
+        or _HTML_BLOCK_RE.match(line)
+    )
+
+
+def _normalize(label: str) -> str:
+    return " ".join(label.split()).casefold()
+
+
+def _label(ref: str) -> str:
+    """Return the normalized label of a reference definition."""
+    return _normalize(ref[ref.index("[") + 1:ref.index("]:")])
+
+
+def _list_marker(line: str):
+    """Return the marker match if line opens a list item."""
+    if _BREAK_RE.match(line):
+        return None
+    return _LIST_RE.match(line)
+
+
+def _interrupts(line: str) -> bool:
+    """Check whether a container line starts a new block mid-paragraph."""
+    if line.lstrip(" ").startswith(">"):
+        return True
+    match = _list_marker(line)
+    return bool(
+        match
+        and match.group(2)
+        and line[match.end():].strip()
+        and match.group(1).lstrip("0") in ("*", "+", "-", "1.", "1)")
+    )
+
+
+def _cells(line: str) -> int:
+    return len(line.strip().strip("|").split("|"))
+
+
+def _skip_until(text: str, pos: int, closes) -> int:
+    """Consume lines up to and including the first one accepted by closes."""
+    length = len(text)
+    while pos < length:
+        end = _line_end(text, pos)
+        if closes(text[pos:end]):
+            return end
+        pos = end
+    return length
+
+
+def _skip_blank(text: str, pos: int) -> int:
+    length = len(text)
+    while pos < length:
+        end = _line_end(text, pos)
+        if text[pos:end].strip():
+            break
+        pos = end
+    return pos
+
+
+def _item_indent(line: str, match) -> int:
+    """Return the content column of a list item line."""
+    spaces = len((match.group(2) or "").expandtabs(4))
+    if spaces > 4 or not line[match.end():].strip():
+        spaces = 1
+    return _indent(line) + len(match.group(1)) + spaces
+
+
+def _block_end(text: str, pos: int) -> int:
+    """Return the end offset of the top-level block starting at pos.
+
+    Blocks own their trailing blank lines, so every boundary falls on the
+    first line of the next block. Splits happen only where a full-document
+    parse is known to be back at the top level: before a line that opens a
+    heading, fence or HTML block outside any list item, or at a blank line
+    followed by an unindented line that does not continue a list. Anything
+    less certain stays in one block, since rendering a merged chunk always
+    matches rendering the whole document.
+    """
+    length = len(text)
+    end = _line_end(text, pos)
+    line = text[pos:end]
+
+    if not line.strip():
+        return _skip_blank(text, end)
+
+    fence = _opens_fence(line)
+    if fence:
+        end = _skip_until(text, end, lambda c: _fence_closes(c, fence))
+        return _skip_blank(text, end)
+
+    html_end = _raw_html_end(line)
+    if html_end:
+        end = _skip_until(text, end, lambda c: html_end.search(c) is not None)
+        return _skip_blank(text, end)
+
+    if _HEADING_RE.match(line):
+        return _skip_blank(text, end)
+
+    # Kinds 6 and 7 run until a blank line and nothing interrupts them.
+    # Whether a tag line really opens one is not tracked, so the flag is set
+    # for any line that might.
+    in_html = line.lstrip(" ").startswith("<")
+    item_indent = None
+    match = _list_marker(line)
+    if match:
+        item_indent = _item_indent(line, match)
+    pos = end
+
+    while pos < length:
+        end = _line_end(text, pos)
+        line = text[pos:end]
+
+        if not line.strip():
+            following = _skip_blank(text, end)
+            if following >= length:
+                return length
+            next_line = text[following:_line_end(text, following)]
+            if next_line[0] in " \t" or (
+                item_indent is not None and _list_marker(next_line)
+            ):
+                in_html = False
+                pos = following
+                continue
+            return following
+
+        indent = _indent(line)
+        in_item = item_indent is not None and indent >= item_indent
+        if not in_item and indent <= 3 and _opens_block(line):
+            if not in_html:
+                return pos
+            if _opens_fence(line) or _raw_html_end(line):
+                # Whether the line above opened an HTML block depends on
+                # parser state we do not track, and the two readings
+                # disagree about where this region ends.
+                return length
+
+        if not in_item:
+            match = _list_marker(line)
+            if match:
+                item_indent = _item_indent(line, match)
+            elif indent <= 3 and line.lstrip(" ").startswith("<"):
+                in_html = True
+        pos = end
+
+    return length
+
+
+def _common_prefix(a: str, b: str) -> int:
+    limit = min(len(a), len(b))
+    pos = 0
+    while pos < limit and a[pos:pos + _CHUNK] == b[pos:pos + _CHUNK]:
+        pos += _CHUNK
+    pos = min(pos, limit)
+    stop = min(pos + _CHUNK, limit)
+    while pos < stop and a[pos] == b[pos]:
+        pos += 1
+    return pos
+
+
+def _common_suffix(a: str, b: str, limit: int) -> int:
+    len_a, len_b = len(a), len(b)
+    size = 0
+    while size < limit:
+        step = min(_CHUNK, limit - size)
+        if a[len_a - size - step:len_a - size] != b[len_b - size - step:len_b - size]:
+            break
+        size += step
+    while size < limit and a[len_a - size - 1] == b[len_b - size - 1]:
+        size += 1
+    return size
+
+
+def split_blocks(text: str) -> list[Block]:
+    """Split Markdown source into top-level block ranges."""
+    blocks = []
+    pos = 0
+    line = 0
+    while pos < len(text):
+        end = _block_end(text, pos)
+        blocks.append(Block(pos, end, line, digest(text[pos:end])))
+        line += text.count("\n", pos, end)
+        pos = end
+    return blocks
+
+
+class IncrementalRenderer:
+    """Render Markdown block by block, re-rendering only blocks that changed.
+
+    The document is kept as a list of top-level blocks. On each update only
+    the region around the edit is re-split, and only blocks whose content
+    hash is not already cached go through comrak.
+    """
+
+    def __init__(self, extension_options=None, render_options=None, cache=None):
+        self.extension_options = extension_options
+        self.render_options = render_options
+        # Rendered blocks, possibly shared with other render stages
+        self.cache = cache if cache is not None else RenderCache()
+
+        self._text = ""
+        self._blocks: list[Block] = []
+        self._refs_by_block: dict[str, tuple] = {}
+        self._labels_by_block: dict[str, frozenset] = {}
+        # (refs_key, html, key) per block key, as of the last render
+        self._rendered: dict[str, tuple] = {}
+
+        # Blocks rendered by the last call, for diagnostics
+        self.last_dirty = 0
+
+    def _render_source(self, source: str) -> str:
+        return comrak.render_markdown(
+            source,
+            extension_options=self.extension_options,
+            render_options=self.render_options,
+        )
+
+    def _update_blocks(self, text: str) -> list[Block]:
+        old_text, old_blocks = self._text, self._blocks
+        if not old_blocks:
+            return split_blocks(text)
+
+        prefix = _common_prefix(old_text, text)
+        if prefix == len(old_text) == len(text):
+            return old_blocks
+
+        suffix = _common_suffix(
+            old_text, text, min(len(old_text), len(text)) - prefix
+        )
+        old_starts = [block.start for block in old_blocks]
+
+        # The block before the edit is re-split too, since its end depends
+        # on the first line of the block that follows it.
+        first = max(0, bisect_right(old_starts, prefix) - 2)
+        blocks = old_blocks[:first]
+        pos = old_blocks[first].start
+        line = old_blocks[first].line
+        delta = len(text) - len(old_text)
+        unchanged_from = len(text) - suffix
+
+        while pos < len(text):
+            end = _block_end(text, pos)
+            blocks.append(Block(pos, end, line, digest(text[pos:end])))
+            line += text.count("\n", pos, end)
+            pos = end
+
+            if pos >= unchanged_from:
+                index = bisect_left(old_starts, pos - delta)
+                if index < len(old_blocks) and old_starts[index] == pos - delta:
+                    line_delta = line - old_blocks[index].line
+                    blocks.extend(
+                        Block(b.start + delta, b.end + delta, b.line + line_delta, b.key)
+                        for b in old_blocks[index:]
+                    )
+                    break
+
+        return blocks
+
+    def _block_refs(self, text: str, block: Block) -> tuple:
+        """Return (definitions, uncertain) for a block.
+
+        Definitions are (label, source) pairs.
+
+        uncertain is set when a line looks like it might hold a definition
+        the scanner cannot place, e.g. inside a container or spread over
+        several lines.
+        """
+        found = self._refs_by_block.get(block.key)
+        if found is not None:
+            return found
+
+        # A light line scanner: definitions only count at the start of a
+        # paragraph, and a table header in that paragraph swallows them.
+        refs = []
+        run = []
+        uncertain = False
+        in_paragraph = defs_open = opaque = lazy = in_list = False
+        previous = ""
+        pos = block.start
+        while pos < block.end:
+            end = _line_end(text, pos)
+            line = text[pos:end]
+            taken = len(run)
+            if not line.strip():
+                refs.extend(run)
+                run = []
+                in_paragraph = defs_open = opaque = False
+            elif opaque:
+                pass
+            elif in_paragraph:
+                match = defs_open and _REF_DEF_RE.fullmatch(text, pos, end)
+                if match:
+                    run.append(match.group().rstrip("\n"))
+                elif _TABLE_DELIM_RE.match(line) and _cells(line) == _cells(previous):
+                    run = []
+                    opaque = True
+                elif not defs_open and not lazy and _SETEXT_RE.match(line):
+                    in_paragraph = False
+                elif _opens_block(line) or _BREAK_RE.match(line) or _interrupts(line):
+                    refs.extend(run)
+                    run = []
+                    in_paragraph = defs_open = False
+                    continue
+                defs_open = bool(match)
+            elif _indent(line) >= 4 and in_list:
+                # Paragraph inside a list item, which takes lazy lines
+                in_paragraph = lazy = True
+            elif _indent(line) >= 4 or _HEADING_RE.match(line) or _BREAK_RE.match(line):
+                pass
+            elif fence := _opens_fence(line):
+                end = _skip_until(text, end, lambda c: _fence_closes(c, fence))
+            elif end_re := _raw_html_end(line):
+                end = _skip_until(text, end, end_re.search)
+            elif _HTML_BLOCK_RE.match(line) or _HTML_TAG_LINE_RE.match(line):
+                opaque = True
+            else:
+                match = _REF_DEF_RE.fullmatch(text, pos, end)
+                if match:
+                    run.append(match.group().rstrip("\n"))
+                in_paragraph = True
+                defs_open = bool(match)
+                # Container lines continue lazily and never take an underline
+                in_list = in_list or bool(_list_marker(line))
+                lazy = in_list or line.lstrip(" ").startswith(">")
+            if "]:" in line and len(run) == taken:
+                uncertain = True
+            previous = line
+            pos = end
+        refs.extend(run)
+        found = (tuple((_label(ref), ref) for ref in refs), uncertain)
+        self._refs_by_block[block.key] = found
+        return found
+
+    def _block_labels(self, text: str, block: Block) -> frozenset:
+        """Return every label the block might refer to."""
+        labels = self._labels_by_block.get(block.key)
+        if labels is None:
+            labels = frozenset(
+                _normalize(match.group(1))
+                for match in _BRACKETS_RE.finditer(text, block.start, block.end)
+            )
+            self._labels_by_block[block.key] = labels
+        return labels
+
+    def _collect_refs(self, text: str, blocks: list[Block]):
+        """Map each defined label to (definition, key of the defining block).
+
+        The first definition of a label wins. Returns None when one of the
+        blocks could not be scanned reliably.
+        """
+        if "]:" not in text:
+            self._refs_by_block = {}
+            self._labels_by_block = {}
+            return {}
+        refs = {}
+        uncertain = False
+        for block in blocks:
+            block_refs, block_uncertain = self._block_refs(text, block)
+            for label, ref in block_refs:
+                refs.setdefault(label, (ref, block.key))
+            uncertain = uncertain or block_uncertain
+        self._refs_by_block = {
+            block.key: self._refs_by_block[block.key] for block in blocks
+        }
+        self._labels_by_block = {
+            block.key: self._labels_by_block[block.key]
+            for block in blocks
+            if block.key in self._labels_by_block
+        }
+        return None if uncertain else refs
+
+    def render_blocks(
+        self, text: str, should_stop=None
+    ) -> Optional[list[tuple[str, str, int, int]]]:
+        """Return (key, html, line, end_line) for every top-level block.
+
+        The key names the rendered html: it covers the block source and the
+        definitions it was rendered against, so a block whose links change
+        gets a new key. Lines are 0-based and end_line is exclusive; the preview uses them
+        to line up its scroll position with the editor.
+
+        should_stop is polled between block renders; once it returns True
+        the render is abandoned and None is returned. Blocks rendered so far
+        stay cached.
+        """
+        blocks = self._update_blocks(text)
+        refs = self._collect_refs(text, blocks)
+        self._text = text
+        self._blocks = blocks
+
+        if refs is None or ("[^" in text and _FOOTNOTE_DEF_RE.search(text)):
+            # Footnotes are numbered and collected document-wide, and
+            # definitions the scanner could not place need the whole text
+            blocks = [Block(0, len(text), 0, digest(text))]
+            refs = {}
+
+        previous = self._rendered
+        used = {}
+        results = []
+        dirty = 0
+
+        for index, block in enumerate(blocks):
+            entry = used.get(block.key)
+            if entry is None:
+                # Definitions render to nothing, so the ones the block
+                # refers to are prepended. Its own are already in its source.
+                prefix = ""
+                labels = refs and self._block_labels(text, block) & refs.keys()
+                if labels:
+                    prefix = "\n".join(
+                        refs[label][0]
+                        for label in sorted(labels)
+                        if refs[label][1] != block.key
+                    )
+                refs_key = digest(prefix) if prefix else ""
+
+                entry = previous.get(block.key)
+                if entry is None or entry[0] != refs_key:
+                    cache_key = f"block:{refs_key}:{block.key}"
+                    html = self.cache.get(cache_key)
+                    if html is None:
+                        if should_stop is not None and should_stop():
+                            return None
+                        source = text[block.start:block.end]
+                        if prefix:
+                            source = f"{prefix}\n\n{source}"
+                        html = self._render_source(source)
+                        self.cache.put(cache_key, html)
+                        dirty += 1
+                    key = f"{refs_key}-{block.key}" if refs_key else block.key
+                    entry = (refs_key, html, key)
+                used[block.key] = entry
+            _, html, key = entry
+            if index + 1 < len(blocks):
+                end_line = blocks[index + 1].line
+            else:
+                end_line = block.line + text.count("\n", block.start, block.end)
+                if block.end > block.start and text[block.end - 1] != "\n":
+                    # The last line has no newline
+                    end_line += 1
+            results.append((key, html, block.line, end_line))
+
+        self._rendered = used
+        self.last_dirty = dirty
+        return results
+
+    def render(self, text: str) -> str:
+        """Render text to an HTML fragment."""
+        return "".join(block[1] for block in self.render_blocks(text))
@@ -0,0 +1,230 @@
+"""Append-only journal of editor edits, for recovery after a crash.
+
+Every window appends its buffer edits, one JSON line each, to its own
+file under JOURNAL_DIR:
+
+    ["snapshot", seq, text, key]     the whole text as of edit seq
+    [seq, offset, removed, inserted] one insertion or deletion
+
+key is the document's path, or None for an untitled one, so text is
+only recovered into the document it was typed in.
+
+Lines are committed in groups by a background thread, and the file is
+replaced by a fresh snapshot once the edits outgrow it. A window holds a
+lock on its journal while it runs and deletes it on a clean exit, so a
+journal nobody holds was left behind by a crash.
+"""
+
+import fcntl
+import json
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+JOURNAL_DIR = os.path.expanduser("~/.config/propad/journal")
+# Edits are written out together once this many ms have passed
+COMMIT_INTERVAL = 250
+# Journaled bytes that trigger a new snapshot, unless the snapshot is larger
+COMPACT_BYTES = 256 * 1024
+
+
+def _encode(record) -> bytes:
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def replay(lines):
+    """Rebuild (text, key, complete) from journal lines.
+
+    text is None if there is no snapshot. A torn last line is what a
+    crash in the middle of a write leaves, and only loses that write;
+    any other bad line or a missing sequence number stops the replay
+    with complete set to False.
+    """
+    text = None
+    key = None
+    seq = None
+    lines = iter(lines)
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return text, key, next(lines, None) is None
+        if record[0] == "snapshot":
+            _, seq, text, key = record
+            continue
+        if text is None:
+            return None, None, False
+
+        record_seq, offset, removed, inserted = record
+        if record_seq <= seq:
+            continue
+        if record_seq != seq + 1:
+            return text, key, False
+        text = text[:offset] + inserted + text[offset + removed:]
+        seq = record_seq
+    return text, key, True
+
+
+def recover(key, journal_dir: str = JOURNAL_DIR):
+    """Claim the newest journal a crashed window left for document key.
+
+    Returns the recovered text, or None. The claimed journal is deleted;
+    older ones and those of other documents are left for the next window
+    to pick up. A journal with edits missing is dropped rather than
+    recovered, as its text may be older than the saved draft.
+    """
+    try:
+        names = os.listdir(journal_dir)
+    except FileNotFoundError:
+        return None
+
+    def mtime(path):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return 0
+
+    paths = [os.path.join(journal_dir, name) for name in names if name.endswith(".log")]
+    for path in sorted(paths, key=mtime, reverse=True):
+        try:
+            f = open(path, "rb")
+        except OSError:
+            continue
+        with f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                # A running window may have just replaced its journal
+                if os.fstat(f.fileno()).st_ino != os.stat(path).st_ino:
+                    continue
+            except OSError:
+                # Still held by a running window
+                continue
+            text, journal_key, complete = replay(f)
+            if text is not None and journal_key != key:
+                continue
+            os.remove(path)
+        if text is None:
+            continue
+        if not complete:
+            print(f"Journal {path} is missing edits; keeping the saved draft")
+            continue
+        return text
+    return None
+
+
+class EditJournal:
+    """This window's journal.
+
+    Nothing is recorded until start() has written the first snapshot.
+    append() only queues lines; commit() hands them to the writer thread.
+    """
+
+    def __init__(self, journal_dir: str = JOURNAL_DIR, fsync: bool = True):
+        self.path = os.path.join(journal_dir, f"{uuid.uuid4().hex}.log")
+        self.fsync = fsync
+        self.key = None
+        self._seq = None
+        self._pending = []
+        self._journaled = 0
+        self._snapshot_size = 0
+        # Owned by the writer thread
+        self._file = None
+        # One writer thread, so writes land in order
+        self._writer = ThreadPoolExecutor(max_workers=1)
+
+    def start(self, version: int, text: str, key=None):
+        """Start journaling document key from text, as of edit version.
+
+        Call it again whenever the window switches documents.
+        """
+        self.key = key
+        self.compact(version, text)
+
+    def append(self, version: int, changes):
+        """Queue the sidebar's (offset, removed, inserted) changes."""
+        if self._seq is None:
+            return
+        first = version - len(changes) + 1
+        for seq, (offset, removed, inserted) in enumerate(changes, first):
+            # Already part of the snapshot
+            if seq <= self._seq:
+                continue
+            self._pending.append(_encode([seq, offset, removed, inserted]))
+            self._seq = seq
+
+    def commit(self):
+        """Write the queued lines in the background."""
+        if not self._pending:
+            return
+        data = b"".join(self._pending)
+        self._pending = []
+        self._journaled += len(data)
+        self._writer.submit(self._append, data)
+
+    def needs_compaction(self) -> bool:
+        return self._journaled > max(COMPACT_BYTES, self._snapshot_size)
+
+    def compact(self, version: int, text: str):
+        """Replace the journal with a snapshot of text at edit version."""
+        data = _encode(["snapshot", version, text, self.key])
+        self._seq = version
+        self._pending = []
+        self._journaled = 0
+        self._snapshot_size = len(data)
+        self._writer.submit(self._rewrite, data)
+
+    def close(self):
+        """Stop journaling and delete the journal.
+
+        Only call this once the text is safe elsewhere, e.g. in a draft.
+        """
+        self._seq = None
+        self._pending = []
+        self._writer.submit(self._remove).result()
+
+    def _sync(self, f):
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    def _append(self, data: bytes):
+        if self._file is None:
+            return
+        try:
+            self._file.write(data)
+            self._sync(self._file)
+        except Exception as e:
+            print(f"Error writing journal: {e}")
+
+    def _rewrite(self, data: bytes):
+        new_file = None
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            new_file = open(tmp_path, "wb")
+            # Locked before it appears under the journal's name
+            fcntl.flock(new_file, fcntl.LOCK_EX)
+            new_file.write(data)
+            self._sync(new_file)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Error writing journal: {e}")
+            if new_file is not None:
+                new_file.close()
+            return
+
+        if self._file is not None:
+            self._file.close()
+        self._file = new_file
+
+    def _remove(self):
+        if self._file is None:
+            return
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error removing journal: {e}")
+        self._file.close()
+        self._file = None
@@ -0,0 +1,125 @@
+import html as html_lib
+import re
+
+# GitHub octicons for the five alert kinds
+ALERT_ICONS = {
+    "NOTE": """<svg viewBox="0 0 16 16" width="16" height="16"><path d="M0 1.75C0 .784.784 0 1.75 0h12.5C15.216 0 16 .784 16 1.75v9.5A1.75 1.75 0 0 1 14.25 13H8.06l-2.573 2.573A1.458 1.458 0 0 1 3 14.543V13H1.75A1.75 1.75 0 0 1 0 11.25Zm1.75-.25a.25.25 0 0 0-.25.25v9.5c0 .138.112.25.25.25h2a.75.75 0 0 1 .75.75v2.19l2.72-2.72a.749.749 0 0 1 .53-.22h6.5a.25.25 0 0 0 .25-.25v-9.5a.25.25 0 0 0-.25-.25Zm7 2.25v2.5a.75.75 0 0 1-1.5 0v-2.5a.75.75 0 0 1 1.5 0ZM9 9a1 1 0 1 1-2 0 1 1 0 0 1 2 0Z"></path></svg>""",
+    "TIP": """<svg viewBox="0 0 16 16" width="16" height="16"><path d="M8 1.5c-2.363 0-4 1.69-4 3.75 0 .984.424 1.625.984 2.304l.214.253c.223.264.47.556.673.848.284.411.537.896.621 1.49a.75.75 0 0 1-1.484.211c-.04-.282-.163-.547-.37-.847a8.456 8.456 0 0 0-.542-.68c-.084-.1-.173-.205-.268-.32C3.201 7.75 2.5 6.766 2.5 5.25 2.5 2.31 4.863 0 8 0s5.5 2.31 5.5 5.25c0 1.516-.701 2.5-1.328 3.259-.095.115-.184.22-.268.319-.207.245-.383.453-.541.681-.208.3-.33.565-.37.847a.751.751 0 0 1-1.485-.212c.084-.593.337-1.078.621-1.489.203-.292.45-.584.673-.848.075-.088.147-.173.213-.253.561-.679.985-1.32.985-2.304 0-2.06-1.637-3.75-4-3.75ZM5.75 12h4.5a.75.75 0 0 1 0 1.5h-4.5a.75.75 0 0 1 0-1.5ZM6 15.25a.75.75 0 0 1 .75-.75h2.5a.75.75 0 0 1 0 1.5h-2.5a.75.75 0 0 1-.75-.75Z"></path></svg>""",
+    "IMPORTANT": """<svg viewBox="0 0 16 16" width="16" height="16"><path d="M0 1.75C0 .784.784 0 1.75 0h12.5C15.216 0 16 .784 16 1.75v9.5A1.75 1.75 0 0 1 14.25 13H8.06l-2.573 2.573A1.458 1.458 0 0 1 3 14.543V13H1.75A1.75 1.75 0 0 1 0 11.25Zm1.75-.25a.25.25 0 0 0-.25.25v9.5c0 .138.112.25.25.25h2a.75.75 0 0 1 .75.75v2.19l2.72-2.72a.749.749 0 0 1 .53-.22h6.5a.25.25 0 0 0 .25-.25v-9.5a.25.25 0 0 0-.25-.25Zm7 2.25v2.5a.75.75 0 0 1-1.5 0v-2.5a.75.75 0 0 1 1.5 0ZM9 9a1 1 0 1 1-2 0 1 1 0 0 1 2 0Z"></path></svg>""",
+    "WARNING": """<svg viewBox="0 0 16 16" width="16" height="16"><path d="M6.457 1.047c.659-1.234 2.427-1.234 3.086 0l6.082 11.378A1.75 1.75 0 0 1 14.082 15H1.918a1.75 1.75 0 0 1-1.543-2.575Zm1.763.707a.25.25 0 0 0-.44 0L1.698 13.132a.25.25 0 0 0 .22.368h12.164a.25.25 0 0 0 .22-.368Zm.53 3.996v2.5a.75.75 0 0 1-1.5 0v-2.5a.75.75 0 0 1 1.5 0ZM9 11a1 1 0 1 1-2 0 1 1 0 0 1 2 0Z"></path></svg>""",
+    "CAUTION": """<svg viewBox="0 0 16 16" width="16" height="16"><path d="M4.47.22A.749.749 0 0 1 5 0h6c.199 0 .389.079.53.22l4.25 4.25c.141.14.22.331.22.53v6a.749.749 0 0 1-.22.53l-4.25 4.25A.749.749 0 0 1 11 16H5a.749.749 0 0 1-.53-.22L.22 11.53A.749.749 0 0 1 0 11V5c0-.199.079-.389.22-.53Zm.84 1.28L1.5 5.31v5.38l3.81 3.81h5.38l3.81-3.81V5.31L10.69 1.5ZM8 4a.75.75 0 0 1 .75.75v3.5a.75.75 0 0 1-1.5 0v-3.5A.75.75 0 0 1 8 4Zm0 8a1 1 0 1 1 0-2 1 1 0 0 1 0 2Z"></path></svg>""",
+}
+
+# One alternation for everything the post-processor rewrites, so the HTML is
+# scanned once. Attributes are allowed on the tags comrak may decorate.
+_TOKEN_RE = re.compile(
+    r'(?P<pre><pre(?:\s[^>]*)?><code class="language-mermaid">|<pre lang="mermaid"><code>)'
+    r'|(?P<code><code class="language-mermaid">)'
+    r"|(?P<fence>```mermaid)"
+    r"|(?P<alert><blockquote(?:\s[^>]*)?>\s*<p(?:\s[^>]*)?>"
+    r"\[!(?P<kind>(?i:NOTE|TIP|IMPORTANT|WARNING|CAUTION))\])"
+    r"|(?P<open><blockquote(?:\s[^>]*)?>)"
+    r"|(?P<close></blockquote>)"
+)
+
+_MERMAID_END = {"pre": "</code></pre>", "code": "</code>", "fence": "```"}
+
+_ALERT_CLOSE = """</div>
+    </div>"""
+
+
+def _mermaid_div(code: str) -> str:
+    code = (
+        code.strip()
+        .replace("&lt;", "<")
+        .replace("&gt;", ">")
+        .replace("&amp;", "&")
+        .replace("&quot;", '"')
+    )
+    # Escaped in both places so the source doubles as the cache key
+    escaped = html_lib.escape(code)
+    return f'<div class="mermaid" data-source="{escaped}">{escaped}</div>'
+
+
+def _alert_open(kind: str) -> str:
+    icon_svg = ALERT_ICONS[kind]
+    return f"""<div class="alert alert-{kind.lower()}" data-alert-type="{kind}">
+        <div class="alert-title">
+            {icon_svg}
+            <span class="alert-title-text">{kind.title()}</span>
+        </div>
+        <div class="alert-content">"""
+
+
+def postprocess_html(html: str) -> str:
+    """Turn comrak output into preview HTML in a single scan.
+
+    Mermaid code blocks become diagram placeholders and blockquotes that
+    open with a [!NOTE]-style marker become GitHub alerts. Blockquotes are
+    matched by depth, so nested alerts work and the cost stays linear.
+    """
+    if "mermaid" not in html and "[!" not in html:
+        return html
+
+    out = []
+    # One entry per open blockquote: True when it was turned into an alert
+    stack = []
+    pos = 0
+    # Where each end marker was last found missing, so a document full of
+    # unclosed openers does not rescan its tail for every one of them
+    missing = {}
+
+    def find(marker: str, start: int) -> int:
+        if missing.get(marker, len(html) + 1) <= start:
+            return -1
+        end = html.find(marker, start)
+        if end == -1:
+            missing[marker] = start
+        return end
+
+    for match in _TOKEN_RE.finditer(html):
+        start = match.start()
+        if start < pos:
+            continue
+        out.append(html[pos:start])
+        pos = match.end()
+        kind = match.lastgroup
+
+        if kind in _MERMAID_END:
+            end = find(_MERMAID_END[kind], pos)
+            if end == -1:
+                out.append(match.group())
+                continue
+            out.append(_mermaid_div(html[pos:end]))
+            pos = end + len(_MERMAID_END[kind])
+
+        elif kind == "alert":
+            end = find("</p>", pos)
+            if end == -1:
+                out.append(match.group())
+                stack.append(False)
+                continue
+            out.append(_alert_open(match.group("kind").upper()))
+            out.append(html[pos:end].strip())
+            pos = end + len("</p>")
+            while pos < len(html) and html[pos].isspace():
+                pos += 1
+            stack.append(True)
+
+        elif kind == "open":
+            out.append(match.group())
+            stack.append(False)
+
+        elif kind == "close":
+            if stack and stack.pop():
+                # Trailing whitespace of the alert body is dropped
+                while out and not out[-1].strip():
+                    out.pop()
+                if out:
+                    out[-1] = out[-1].rstrip()
+                out.append(_ALERT_CLOSE)
+            else:
+                out.append(match.group())
+
+    out.append(html[pos:])
+    return "".join(out)
@@ -0,0 +1,207 @@
+import os
+
+import comrak
+
+from propad.cache import DEFAULT_MAX_BYTES, RenderCache, digest
+from propad.postprocess import postprocess_html
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+VENDOR_DIR = os.path.join(ASSETS_DIR, "vendor")
+SCHEME = "propad"
+
+# Vendored libraries and the CDN builds they replace when missing.
+# `just vendor-assets` fetches them; the meson and flatpak builds fail
+# without them, so the CDN is only used from a bare source checkout.
+MERMAID = ("mermaid/mermaid.min.js", "https://cdn.jsdelivr.net/npm/mermaid@11/dist/mermaid.min.js")
+MATHJAX = ("mathjax/es5/tex-svg.js", "https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-svg.js")
+
+# Exported documents use their own palette on top of styles.css
+EXPORT_PALETTES = {
+    False: {
+        "bg-color": "#ffffff",
+        "text-color": "#1e1e1e",
+        "link-color": "#0066cc",
+        "code-bg": "#f5f5f5",
+        "pre-bg": "#f5f5f5",
+        "border-color": "#e1e4e8",
+        "note-bg": "#dbeafe",
+        "note-border": "#3b82f6",
+        "tip-bg": "#d1fae5",
+        "tip-border": "#10b981",
+        "important-bg": "#f3e8ff",
+        "important-border": "#a855f7",
+        "warning-bg": "#fef3c7",
+        "warning-border": "#f59e0b",
+        "caution-bg": "#fee2e2",
+        "caution-border": "#ef4444",
+    },
+    True: {
+        "bg-color": "#1e1e1e",
+        "text-color": "#d4d4d4",
+        "link-color": "#4fc3f7",
+        "code-bg": "#2d2d2d",
+        "pre-bg": "#2d2d2d",
+        "border-color": "#333333",
+        "note-bg": "#1f2937",
+        "note-border": "#3b82f6",
+        "tip-bg": "#1e3a2e",
+        "tip-border": "#10b981",
+        "important-bg": "#3a2e42",
+        "important-border": "#a855f7",
+        "warning-bg": "#3a2e1e",
+        "warning-border": "#f59e0b",
+        "caution-bg": "#3a1e1e",
+        "caution-border": "#ef4444",
+    },
+}
+
+
+def make_extension_options():
+    """Return the comrak extensions ProPad renders with."""
+    extension_options = comrak.ExtensionOptions()
+    extension_options.table = True
+    extension_options.strikethrough = True
+    extension_options.autolink = True
+    extension_options.tasklist = True
+    extension_options.superscript = True
+    extension_options.footnotes = True
+    return extension_options
+
+
+def asset_url(asset) -> str:
+    """Return the propad:// URL of a vendored asset, or its CDN fallback."""
+    path, cdn_url = asset
+    if os.path.isfile(os.path.join(VENDOR_DIR, path)):
+        return f"{SCHEME}://vendor/{path}"
+    return cdn_url
+
+
+class RenderPipeline:
+    """Markdown to HTML in stages, shared by the preview and export.
+
+    The stages are the comrak fragment, the post-processed fragment and the
+    full document. Stage results go into a bounded LRU cache that the
+    incremental preview renderer shares, and the page head for each theme
+    is built once, so consumers of the same text share the work.
+    """
+
+    def __init__(self, cache_bytes: int = DEFAULT_MAX_BYTES):
+        self.extension_options = make_extension_options()
+        self.cache = RenderCache(cache_bytes)
+        self._assets = {}
+        self._heads = {}
+
+    def asset(self, filename: str) -> str:
+        """Return the contents of a file under assets/, read once."""
+        content = self._assets.get(filename)
+        if content is None:
+            try:
+                with open(os.path.join(ASSETS_DIR, filename), "r", encoding="utf-8") as f:
+                    content = f.read()
+            except Exception as e:
+                print(f"Error loading {filename}: {e}")
+                content = ""
+            self._assets[filename] = content
+        return content
+
+    def _stage(self, name: str, text: str, build):
+        key = f"{name}:{digest(text)}"
+        result = self.cache.get(key)
+        if result is None:
+            result = build()
+            self.cache.put(key, result)
+        return result
+
+    def fragment(self, text: str) -> str:
+        """Render Markdown to an HTML fragment."""
+        return self._stage(
+            "fragment",
+            text,
+            lambda: comrak.render_markdown(text, extension_options=self.extension_options),
+        )
+
+    def processed_fragment(self, text: str) -> str:
+        """Render Markdown to a fragment with alerts and diagrams rewritten."""
+        return self._stage(
+            "processed", text, lambda: postprocess_html(self.fragment(text))
+        )
+
+    def document(self, text: str, is_dark: bool = False) -> str:
+        """Render Markdown to a standalone HTML document."""
+        html_class = ' class="dark"' if is_dark else ""
+        return f"""<!DOCTYPE html>
+<html{html_class}>
+{self.head(is_dark)}
+<body>
+{self.processed_fragment(text)}
+</body>
+</html>"""
+
+    def shell(self) -> str:
+        """Return the live preview page that blocks are patched into."""
+        return f"""<!DOCTYPE html>
+<html>
+{self.head(None)}
+<body>
+<main id="preview"></main>
+</body>
+</html>"""
+
+    def head(self, is_dark) -> str:
+        """Return the page head for a theme, or for the preview when None.
+
+        The preview themes itself through CSS variables and loads vendored
+        libraries; standalone documents carry their palette and use the CDN
+        builds so they work outside the app.
+        """
+        head = self._heads.get(is_dark)
+        if head is not None:
+            return head
+
+        preview = is_dark is None
+        css_content = self.asset("styles.css")
+        if not preview:
+            palette = "".join(
+                f"    --{name}: {value};\n"
+                for name, value in EXPORT_PALETTES[is_dark].items()
+            )
+            # Matches the specificity of the :root.dark theme rule
+            css_content = f"{css_content}\n\n:root, :root.dark {{\n{palette}}}"
+
+        title = "" if preview else "<title>Exported Document</title>\n"
+        mermaid_url = asset_url(MERMAID) if preview else MERMAID[1]
+        mathjax_url = asset_url(MATHJAX) if preview else MATHJAX[1]
+        js_mathjax_config = self.asset("mathjax-config.js").replace(
+            "{mathjax_url}", mathjax_url
+        )
+        js_preview_shell = ""
+        if preview:
+            js_preview_shell = f"""
+<script>
+{self.asset("preview-shell.js")}
+</script>"""
+
+        head = f"""<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+{title}<style id="theme-style">
+{css_content}
+</style>
+
+<!-- Mermaid for diagrams -->
+<script src="{mermaid_url}"></script>
+<script type="module">
+{self.asset("mermaid-loader.js")}
+</script>
+
+<!-- MathJax for LaTeX -->
+<script>
+{js_mathjax_config}
+</script>
+
+<script>
+{self.asset("mathjax-render.js")}
+</script>{js_preview_shell}
+</head>"""
+        self._heads[is_dark] = head
+        return head
@@ -0,0 +1,224 @@
+"""Markdown rendering in a separate process.
+
+The GUI process talks to the worker over its stdin/stdout pipes with
+length-prefixed frames, so a pathological document only ever stalls the
+worker, which can then be killed and restarted.
+"""
+
+import json
+import os
+import select
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+# Seconds a single render may take before the worker is killed
+RENDER_TIMEOUT = 10.0
+# How often a waiting render checks whether it has been superseded
+POLL_INTERVAL = 0.05
+
+# Frame header: job id, status, payload length. Requests carry the
+# Markdown text; replies carry JSON [dirty, [[key, html, line, end_line],
+# ...]], where dirty counts the blocks that went through comrak, or an
+# error message.
+_HEADER = struct.Struct("!IBI")
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+_PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _write_frame(stream, job_id: int, status: int, payload: bytes):
+    stream.write(_HEADER.pack(job_id, status, len(payload)))
+    stream.write(payload)
+    stream.flush()
+
+
+def _read_exact(stream, size: int) -> bytes:
+    data = stream.read(size)
+    if len(data) < size:
+        raise EOFError
+    return data
+
+
+class RenderWorker:
+    """Client for a render worker subprocess.
+
+    render_blocks() has the same contract as IncrementalRenderer's, but
+    the returned fragments are already post-processed. A render that runs
+    past the timeout kills the worker, and a dead worker is started again
+    on the next job.
+    """
+
+    def __init__(self, timeout: float = RENDER_TIMEOUT):
+        self.timeout = timeout
+        self._process = None
+        self._buffer = bytearray()
+        self._job_id = 0
+        # Replies still owed by the worker for jobs given up on
+        self._abandoned = set()
+        self._lock = threading.Lock()
+
+        self.restarts = 0
+        self.timeouts = 0
+        # Blocks the worker rendered for the last job, for diagnostics
+        self.last_dirty = 0
+
+    def _start(self):
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(
+            path for path in (_PACKAGE_ROOT, env.get("PYTHONPATH")) if path
+        )
+        self._process = subprocess.Popen(
+            [sys.executable, "-m", "propad.render_worker"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=env,
+        )
+        self._buffer.clear()
+        self._abandoned.clear()
+
+    def _stop(self):
+        process = self._process
+        self._process = None
+        if process is None:
+            return
+        try:
+            process.kill()
+            process.wait(timeout=1)
+        except Exception as e:
+            print(f"Error stopping render worker: {e}")
+
+    def close(self):
+        """Stop the worker process."""
+        with self._lock:
+            self._stop()
+
+    def render_blocks(self, text: str, should_stop=None):
+        """Render text in the worker and return its (key, html) blocks.
+
+        Returns None as soon as should_stop() turns True; the worker's
+        reply for that job is discarded when it arrives.
+        """
+        with self._lock:
+            if self._process is None or self._process.poll() is not None:
+                if self._job_id:
+                    self.restarts += 1
+                self._start()
+
+            self._job_id = (self._job_id + 1) & 0xFFFFFFFF
+            job_id = self._job_id
+            try:
+                _write_frame(self._process.stdin, job_id, STATUS_OK, text.encode("utf-8"))
+            except OSError as e:
+                self._stop()
+                raise RuntimeError(f"render worker is gone: {e}")
+
+            deadline = time.monotonic() + self.timeout
+            while True:
+                frame = self._read_frame(deadline, should_stop)
+                if frame is None:
+                    self._abandoned.add(job_id)
+                    return None
+                reply_id, status, payload = frame
+                if reply_id in self._abandoned:
+                    self._abandoned.discard(reply_id)
+                    # The worker was busy with an old job; restart the clock
+                    deadline = time.monotonic() + self.timeout
+                    continue
+                break
+
+        if status != STATUS_OK:
+            raise RuntimeError(payload.decode("utf-8", "replace"))
+        self.last_dirty, blocks = json.loads(payload)
+        return [tuple(block) for block in blocks]
+
+    def _read_frame(self, deadline: float, should_stop):
+        """Read one reply frame, or None when should_stop() turned True."""
+        fd = self._process.stdout.fileno()
+        needed = _HEADER.size
+
+        while True:
+            if len(self._buffer) >= _HEADER.size:
+                needed = _HEADER.size + _HEADER.unpack_from(self._buffer)[2]
+                if len(self._buffer) >= needed:
+                    job_id, status, _ = _HEADER.unpack_from(self._buffer)
+                    payload = bytes(self._buffer[_HEADER.size:needed])
+                    del self._buffer[:needed]
+                    return job_id, status, payload
+
+            if should_stop is not None and should_stop():
+                return None
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.timeouts += 1
+                self._stop()
+                raise TimeoutError(
+                    f"render took longer than {self.timeout:g}s, worker restarted"
+                )
+
+            ready, _, _ = select.select([fd], [], [], min(remaining, POLL_INTERVAL))
+            if not ready:
+                continue
+            chunk = os.read(fd, max(needed - len(self._buffer), 65536))
+            if not chunk:
+                self._stop()
+                raise RuntimeError("render worker exited unexpectedly")
+            self._buffer.extend(chunk)
+
+
+def main():
+    """Serve render requests from stdin until it is closed."""
+    from propad.cache import digest
+    from propad.incremental import IncrementalRenderer
+    from propad.postprocess import postprocess_html
+    from propad.render import make_extension_options
+
+    requests = sys.stdin.buffer
+    replies = sys.stdout.buffer
+    # Keep stray prints off the protocol pipe
+    sys.stdout = sys.stderr
+
+    renderer = IncrementalRenderer(make_extension_options())
+    # Post-processed fragments of the last job, by digest of their html:
+    # the same block source can render differently once link definitions
+    # elsewhere change
+    processed = {}
+
+    while True:
+        try:
+            job_id, _, length = _HEADER.unpack(_read_exact(requests, _HEADER.size))
+            text = _read_exact(requests, length).decode("utf-8")
+        except EOFError:
+            return
+
+        try:
+            blocks = []
+            used = {}
+            for key, html, line, end_line in renderer.render_blocks(text):
+                html_key = digest(html)
+                fragment = used.get(html_key)
+                if fragment is None:
+                    fragment = processed.get(html_key)
+                if fragment is None:
+                    fragment = postprocess_html(html)
+                used[html_key] = fragment
+                blocks.append((key, fragment, line, end_line))
+            processed = used
+            payload = json.dumps([renderer.last_dirty, blocks]).encode("utf-8")
+            status = STATUS_OK
+        except Exception as e:
+            payload = str(e).encode("utf-8")
+            status = STATUS_ERROR
+
+        try:
+            _write_frame(replies, job_id, status, payload)
+        except BrokenPipeError:
+            return
+
+
+if __name__ == "__main__":
+    main()
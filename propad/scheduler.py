@@ -0,0 +1,96 @@
+import threading
+import time
+
+from gi.repository import GLib
+
+
+class RenderScheduler:
+    """Latest-wins render queue.
+
+    Every submit bumps a generation counter. At most one render runs at a
+    time, only the newest pending text is kept, and a result is dropped at
+    any stage once a newer submit has superseded it.
+    """
+
+    def __init__(self, executor, render, apply):
+        # render(text, is_stale) runs in a worker and may return None when
+        # is_stale() turns True; apply(result) runs in the main thread.
+        self._executor = executor
+        self._render = render
+        self._apply = apply
+
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._pending = None
+        self._running = False
+
+        # Superseded renders, for diagnostics
+        self.dropped = 0
+
+        # Moving average of submit-to-apply time in seconds
+        self.last_cost = 0.0
+        self.average_cost = 0.0
+        self._smoothing = 0.3
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def submit(self, text: str):
+        """Schedule text for rendering, superseding anything older."""
+        with self._lock:
+            self._generation += 1
+            if self._pending is not None:
+                self.dropped += 1
+            self._pending = (self._generation, text)
+            if self._running:
+                return
+            self._running = True
+        self._executor.submit(self._run)
+
+    def cancel(self):
+        """Drop the pending render and any result still in flight."""
+        with self._lock:
+            self._generation += 1
+            self._pending = None
+
+    def _run(self):
+        while True:
+            with self._lock:
+                job = self._pending
+                self._pending = None
+                if job is None:
+                    self._running = False
+                    return
+
+            generation, text = job
+            started = time.perf_counter()
+
+            def is_stale():
+                return generation != self._generation
+
+            try:
+                result = self._render(text, is_stale)
+            except Exception as e:
+                print(f"Error rendering markdown: {e}")
+                continue
+
+            if result is None or is_stale():
+                self.dropped += 1
+                continue
+            GLib.idle_add(self._deliver, generation, result, started)
+
+    def _deliver(self, generation, result, started):
+        if generation == self._generation:
+            self._apply(result)
+            self._record_cost(time.perf_counter() - started)
+        else:
+            self.dropped += 1
+        return False
+
+    def _record_cost(self, cost: float):
+        self.last_cost = cost
+        if self.average_cost:
+            self.average_cost += self._smoothing * (cost - self.average_cost)
+        else:
+            self.average_cost = cost
@@ -0,0 +1,63 @@
+import gi
+import mimetypes
+import os
+
+gi.require_version("WebKit", "6.0")
+
+from gi.repository import Gio, GLib, WebKit
+from propad.render import SCHEME, VENDOR_DIR
+
+# Responses stay in memory for the whole session
+_cache = {}
+_registered = False
+
+
+def register_scheme():
+    """Serve propad://vendor/ from the vendored assets directory."""
+    global _registered
+    if _registered:
+        return
+    _registered = True
+
+    context = WebKit.WebContext.get_default()
+    context.register_uri_scheme(SCHEME, _on_request)
+
+    security_manager = context.get_security_manager()
+    security_manager.register_uri_scheme_as_secure(SCHEME)
+    security_manager.register_uri_scheme_as_cors_enabled(SCHEME)
+
+
+def _load(path: str):
+    if path in _cache:
+        return _cache[path]
+
+    full_path = os.path.realpath(os.path.join(VENDOR_DIR, path))
+    if not full_path.startswith(os.path.realpath(VENDOR_DIR) + os.sep):
+        return None
+    try:
+        with open(full_path, "rb") as f:
+            data = GLib.Bytes.new(f.read())
+    except OSError:
+        return None
+
+    mime_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+    _cache[path] = (data, mime_type)
+    return _cache[path]
+
+
+def _on_request(request):
+    uri = GLib.Uri.parse(request.get_uri(), GLib.UriFlags.NONE)
+    path = uri.get_path().lstrip("/")
+    entry = _load(path) if uri.get_host() == "vendor" else None
+
+    if entry is None:
+        request.finish_error(
+            GLib.Error.new_literal(
+                Gio.io_error_quark(), f"Not found: {path}", Gio.IOErrorEnum.NOT_FOUND
+            )
+        )
+        return
+
+    data, mime_type = entry
+    stream = Gio.MemoryInputStream.new_from_bytes(data)
+    request.finish(stream, data.get_size(), mime_type)
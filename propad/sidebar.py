@@ -6,6 +6,7 @@ gi.require_version(namespace="Gtk", version="4.0")
 from gi.repository import Gtk, Gdk, GLib
 from propad.search_replace import SearchReplaceBar
 from propad.formatting_toolbar import FormattingToolbar
+from propad.text_stats import TextStats
 from propad.i18n import _
 
 UI_FILE = "ui/sidebar.ui"
@@ -42,10 +43,26 @@ class SidebarWidget(Gtk.Box):
         self._last_scroll_value = 0.0
         self._target_scroll_value = 0.0
         self._scroll_velocity = 0.0
-        self._scroll_poll_id = None
+        self._scroll_tick_id = None
         self._scroll_animation_id = None
 
-        self.buffer.connect("changed", self._on_buffer_changed)
+        # Every edit bumps the version; the text is copied out of the
+        # buffer at most once per version, and only when asked for
+        self.version = 0
+        self._snapshot = (-1, "")
+        self._changes = []
+        self._deleted_range = None
+
+        # Statistics follow the buffer edit by edit
+        self._text_stats = TextStats(self.get_text())
+        self._stats_tick_id = None
+        self.buffer.connect_after("insert-text", self._on_insert_text)
+        self.buffer.connect("delete-range", self._on_delete_range)
+        self.buffer.connect_after("delete-range", self._on_range_deleted)
+        # "changed" is emitted inside the default handlers, before the
+        # after-handlers have recorded the edit, so callbacks are called
+        # from those instead
+
         self.hide_webview_btn.connect("clicked", self._on_hide_webview_clicked)
 
         self.search_bar = SearchReplaceBar(self.textview)
@@ -75,19 +92,61 @@ class SidebarWidget(Gtk.Box):
 
     def _update_stats(self):
         """Update word, letter, and paragraph count."""
-        text = self.get_text()
-
-        paragraphs = len([line for line in text.split("\n") if line.strip()])
+        stats = self._text_stats
+        self.stats_label.set_text(
+            f"{_('Words')}: {stats.words}  •  {_('Letters')}: {stats.letters}  •  {_('Paragraphs')}: {stats.paragraphs}"
+        )
 
-        words = len(text.split())
+    def _schedule_stats_update(self):
+        """Refresh the label at most once per frame."""
+        if not self._stats_tick_id:
+            self._stats_tick_id = self.add_tick_callback(self._on_stats_tick)
 
-        letters = len([c for c in text if not c.isspace()])
+    def _on_stats_tick(self, widget, frame_clock):
+        self._stats_tick_id = None
+        self._update_stats()
+        return GLib.SOURCE_REMOVE
+
+    def _line_texts(self, first: int, last: int):
+        """Return the text of buffer lines first..last, without newlines."""
+        _, start = self.buffer.get_iter_at_line(first)
+        _, end = self.buffer.get_iter_at_line(last)
+        if not end.ends_line():
+            end.forward_to_line_end()
+        return self.buffer.get_text(start, end, True).split("\n")
+
+    def _on_insert_text(self, buffer, location, text, length):
+        # location now sits at the end of the inserted text
+        self.version += 1
+        self._changes.append((location.get_offset() - len(text), 0, text))
+
+        last = location.get_line()
+        first = last - text.count("\n")
+        self._text_stats.replace_lines(first, 1, self._line_texts(first, last))
+        self._schedule_stats_update()
+        self._notify_text_changed()
+
+    def _on_delete_range(self, buffer, start, end):
+        if start.compare(end) > 0:
+            start, end = end, start
+        self._deleted_range = (
+            start.get_offset(),
+            end.get_offset() - start.get_offset(),
+            start.get_line(),
+            end.get_line(),
+        )
 
-        # Update label
+    def _on_range_deleted(self, buffer, start, end):
+        offset, removed, first, last = self._deleted_range
+        self._deleted_range = None
+        self.version += 1
+        self._changes.append((offset, removed, ""))
 
-        self.stats_label.set_text(
-            f"{_('Words')}: {words}  •  {_('Letters')}: {letters}  •  {_('Paragraphs')}: {paragraphs}"
+        self._text_stats.replace_lines(
+            first, last - first + 1, self._line_texts(first, first)
         )
+        self._schedule_stats_update()
+        self._notify_text_changed()
 
     def _setup_shortcuts(self):
         """Setup keyboard shortcuts."""
@@ -96,7 +155,7 @@ class SidebarWidget(Gtk.Box):
         self.textview.add_controller(key_controller)
 
     def _setup_scroll_sync(self):
-        """Setup optimized scroll polling."""
+        """Track the editor scroll position from its adjustment."""
         parent = self.textview.get_parent()
 
         # Find ScrolledWindow parent
@@ -107,11 +166,7 @@ class SidebarWidget(Gtk.Box):
                 vadjustment = parent.get_vadjustment()
                 if vadjustment:
                     self._scroll_adjustment = vadjustment
-                    # Use 60fps for better stability
-                    if self._scroll_poll_id:
-                        GLib.source_remove(self._scroll_poll_id)
-                    self._scroll_poll_id = GLib.timeout_add(16, self._poll_scroll)
-                    
+                    vadjustment.connect("value-changed", self._on_scroll_value_changed)
                     return False
             parent = parent.get_parent()
             depth += 1
@@ -119,40 +174,42 @@ class SidebarWidget(Gtk.Box):
         print("⚠ Warning: Could not find ScrolledWindow parent for scroll sync")
         return False
 
-    def _poll_scroll(self):
-        """Poll scroll at 60fps for stable tracking."""
+    def _on_scroll_value_changed(self, adjustment):
+        """Coalesce scroll changes to one notification per frame."""
         if (
-            not self.sync_scroll_enabled
+            self._scroll_tick_id
+            or not self.sync_scroll_enabled
             or self._is_programmatic_scroll
-            or not self._scroll_adjustment
+            or not self._scroll_callbacks
         ):
-            return True
+            return
 
-        try:
-            value = self._scroll_adjustment.get_value()
-            upper = self._scroll_adjustment.get_upper()
-            page_size = self._scroll_adjustment.get_page_size()
+        # Background windows do not drive the preview
+        root = self.get_root()
+        if root is not None and not root.is_active():
+            return
 
-            max_scroll = upper - page_size
-            if max_scroll <= 0:
-                percentage = 0.0
-            else:
-                percentage = value / max_scroll
+        self._scroll_tick_id = self.add_tick_callback(self._on_scroll_tick)
 
-            # Balanced threshold for smooth tracking
-            if abs(percentage - self._last_scroll_value) > 0.003:
-                self._last_scroll_value = percentage
+    def _on_scroll_tick(self, widget, frame_clock):
+        self._scroll_tick_id = None
+        if not self.sync_scroll_enabled or self._is_programmatic_scroll:
+            return GLib.SOURCE_REMOVE
 
-                # Notify callbacks directly
-                for callback in self._scroll_callbacks:
-                    try:
-                        callback(percentage)
-                    except Exception as e:
-                        print(f"Error in scroll callback: {e}")
-        except Exception as e:
-            print(f"Sidebar poll error: {e}")
+        value = self._scroll_adjustment.get_value()
+        max_scroll = (
+            self._scroll_adjustment.get_upper() - self._scroll_adjustment.get_page_size()
+        )
+        percentage = value / max_scroll if max_scroll > 0 else 0.0
 
-        return True
+        if abs(percentage - self._last_scroll_value) > 0.003:
+            self._last_scroll_value = percentage
+            for callback in self._scroll_callbacks:
+                try:
+                    callback(percentage)
+                except Exception as e:
+                    print(f"Error in scroll callback: {e}")
+        return GLib.SOURCE_REMOVE
 
     def get_scroll_percentage(self, callback):
         """Get current scroll percentage."""
@@ -213,12 +270,59 @@ class SidebarWidget(Gtk.Box):
 
         GLib.timeout_add(150, reset_flags)
 
+    def get_top_line(self) -> float:
+        """Return the buffer line at the top of the view, with the fraction
+        of it scrolled past."""
+        if not self._scroll_adjustment:
+            return 0.0
+
+        y = self._scroll_adjustment.get_value()
+        line_iter, _ = self.textview.get_line_at_y(int(y))
+        line_y, height = self.textview.get_line_yrange(line_iter)
+        fraction = (y - line_y) / height if height > 0 else 0.0
+        return line_iter.get_line() + max(0.0, min(1.0, fraction))
+
+    def scroll_to_line(self, line: float):
+        """Scroll so that buffer line (0-based, fractional) is at the top."""
+        if not self._scroll_adjustment:
+            return
+
+        found, line_iter = self.buffer.get_iter_at_line(int(line))
+        if not found:
+            line_iter = self.buffer.get_end_iter()
+        line_y, height = self.textview.get_line_yrange(line_iter)
+        target_value = line_y + (line - int(line)) * height
+
+        max_scroll = (
+            self._scroll_adjustment.get_upper() - self._scroll_adjustment.get_page_size()
+        )
+        if max_scroll <= 0:
+            return
+
+        was_syncing = self.sync_scroll_enabled
+        self.sync_scroll_enabled = False
+        self._is_programmatic_scroll = True
+
+        target_value = max(0.0, min(max_scroll, target_value))
+        self._scroll_adjustment.set_value(target_value)
+        self._last_scroll_value = target_value / max_scroll
+
+        def reset_flags():
+            self._is_programmatic_scroll = False
+            self.sync_scroll_enabled = was_syncing
+            return False
+
+        GLib.timeout_add(150, reset_flags)
+
     def connect_scroll_changed(self, callback):
         self._scroll_callbacks.append(callback)
         
 
     def set_sync_scroll_enabled(self, enabled: bool):
         self.sync_scroll_enabled = enabled
+        if not enabled and self._scroll_tick_id:
+            self.remove_tick_callback(self._scroll_tick_id)
+            self._scroll_tick_id = None
         print(f"✅ Sync scroll {'enabled' if enabled else 'disabled'}")
 
     def _on_key_pressed(self, controller, keyval, keycode, state):
@@ -265,14 +369,12 @@ class SidebarWidget(Gtk.Box):
             cursor = self.buffer.get_iter_at_mark(self.buffer.get_insert())
             self.buffer.insert(cursor, f"{prefix}text{suffix}")
 
-    def _on_buffer_changed(self, buffer):
-        """Call all registered callbacks when text changes."""
-        # Update statistics
-        self._update_stats()
-
-        # Call text changed callbacks
+    def _notify_text_changed(self):
+        """Call all registered callbacks with the edits since the last call."""
+        changes = self._changes
+        self._changes = []
         for callback in self._text_changed_callbacks:
-            callback(self.get_text())
+            callback(self.version, changes)
 
     def _on_hide_webview_clicked(self) -> None:
         """Toggle webview visibility."""
@@ -300,30 +402,40 @@ class SidebarWidget(Gtk.Box):
         self.state_manager.save_webview_hidden(self.webview_hidden)
 
     def connect_text_changed(self, callback):
-        """Register a callback for text changes."""
+        """Register callback(version, changes) for text changes.
+
+        changes lists the edits since the last call as (offset, removed,
+        inserted): the character offset, the number of characters deleted
+        and the text inserted there. Use get_snapshot() for the whole text.
+        """
         self._text_changed_callbacks.append(callback)
 
     def connect_hide_webview(self, callback):
         """Register a callback for hide webview button."""
         self._hide_webview_callbacks.append(callback)
 
+    def get_snapshot(self):
+        """Return (version, text) for the current buffer contents."""
+        version, text = self._snapshot
+        if version != self.version:
+            start_iter = self.buffer.get_start_iter()
+            end_iter = self.buffer.get_end_iter()
+            text = self.buffer.get_text(start_iter, end_iter, True)
+            self._snapshot = (self.version, text)
+        return self.version, text
+
     def get_text(self):
-        start_iter = self.buffer.get_start_iter()
-        end_iter = self.buffer.get_end_iter()
-        return self.buffer.get_text(start_iter, end_iter, True)
+        return self.get_snapshot()[1]
+
+    def get_char_count(self) -> int:
+        return self.buffer.get_char_count()
 
     def set_text(self, text: str):
-        """Set text and trigger callbacks."""
+        """Set text; the buffer signals trigger the callbacks."""
         self.buffer.set_text(text)
-        self._update_stats()
-        for callback in self._text_changed_callbacks:
-            callback(text)
 
     def clear(self):
         self.buffer.set_text("")
-        self._update_stats()
-        for callback in self._text_changed_callbacks:
-            callback("")
 
     def get_cursor_position(self):
         """Get cursor position offset."""
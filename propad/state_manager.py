@@ -1,22 +1,47 @@
 import gi
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 gi.require_version("Gtk", "4.0")
 gi.require_version("Adw", "1")
 
-from gi.repository import Adw, Gdk, Gtk
+from gi.repository import Adw, Gdk, GLib, Gtk
+from propad.drafts import DraftStore, UNTITLED_PREFIX, new_untitled_key
 
 
 CONFIG_DIR = os.path.expanduser("~/.config/propad")
 STATE_FILE = os.path.join(CONFIG_DIR, "state.json")
+# Changes are written out together once this many ms have passed
+SAVE_DELAY = 1000
+# Sync state.json to disk on every write; slower, survives power loss
+FSYNC = os.environ.get("PROPAD_STATE_FSYNC", "0") == "1"
+
+# Untitled drafts held by a window of this process
+_claimed_drafts = set()
 
 
 class StateManager:
-    """Manages application state persistence."""
+    """Manages application state persistence.
+
+    The save_* setters only update the state and mark it dirty; it is
+    written once per SAVE_DELAY by a background thread, or right away by
+    flush(). The editor text is kept in a DraftStore, so state.json only
+    records which draft to restore. Every window has its own
+    StateManager and writes its untitled text under a draft key of its
+    own, so windows never share or delete each other's drafts.
+    """
 
-    def __init__(self):
+    def __init__(self, fsync: bool = FSYNC):
         self.state = self.load_state()
+        self.drafts = DraftStore()
+        # The draft this window writes to
+        self.draft_key = None
+        self.fsync = fsync
+        self._dirty = False
+        self._save_timer_id = None
+        # One writer thread, so saves land in order
+        self._writer = ThreadPoolExecutor(max_workers=1)
 
         # Listen to system theme changes
         self.style_manager = Adw.StyleManager.get_default()
@@ -66,7 +91,7 @@ class StateManager:
         return {
             "window": {"width": 950, "height": 750, "maximized": False},
             "current_file": None,
-            "content": "",
+            "draft": None,
             "cursor_position": 0,
             "sidebar_visible": True,
             "webview_hidden": False,
@@ -74,10 +99,44 @@ class StateManager:
         }
 
     def save_state(self):
+        """Mark the state dirty and schedule a write."""
+        self._dirty = True
+        if self._save_timer_id is None:
+            self._save_timer_id = GLib.timeout_add(SAVE_DELAY, self._on_save_timeout)
+
+    def _on_save_timeout(self):
+        self._save_timer_id = None
+        self.flush(wait=False)
+        return False
+
+    def flush(self, wait: bool = True):
+        """Write pending changes now; in the background unless wait."""
+        if wait:
+            self.drafts.flush()
+        if self._save_timer_id is not None:
+            GLib.source_remove(self._save_timer_id)
+            self._save_timer_id = None
+        if not self._dirty:
+            return
+        self._dirty = False
+
+        # Serialize here so the writer never sees the state half-updated
+        data = json.dumps(self.state)
+        future = self._writer.submit(self._write, data, self.fsync)
+        if wait:
+            future.result()
+
+    @staticmethod
+    def _write(data: str, fsync: bool):
         try:
             os.makedirs(CONFIG_DIR, exist_ok=True)
-            with open(STATE_FILE, "w") as f:
-                json.dump(self.state, f, indent=2)
+            tmp_path = f"{STATE_FILE}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(data)
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, STATE_FILE)
         except Exception as e:
             print(f"Error saving state: {e}")
 
@@ -94,13 +153,56 @@ class StateManager:
         self.save_state()
 
     def get_content(self):
-        """Get saved content."""
-        return self.state.get("content", "")
-
-    def save_content(self, content):
-        """Save content."""
-        self.state["content"] = content
-        self.save_state()
+        """Get saved content, reading its draft from disk."""
+        if "content" in self.state:
+            # state.json from before the draft store; move the text out
+            content = self.state.pop("content")
+            self.save_content(content, self.get_current_file())
+            return content
+
+        key = self.state.get("draft")
+        if not key:
+            return ""
+        if not key.startswith(UNTITLED_PREFIX):
+            self.draft_key = key
+        elif key not in _claimed_drafts:
+            # Left by a closed window; another open one keeps its own
+            _claimed_drafts.add(key)
+            self.draft_key = key
+        return self.drafts.load(key) or ""
+
+    def is_draft_for(self, filepath) -> bool:
+        """Check whether the draft key is the one filepath saves to."""
+        if filepath:
+            return self.draft_key == filepath
+        return bool(self.draft_key) and self.draft_key.startswith(UNTITLED_PREFIX)
+
+    def save_content(self, content, filepath=None):
+        """Save content as the draft for filepath, or an untitled one."""
+        old_key = self.draft_key
+        if self.is_draft_for(filepath):
+            key = old_key
+        elif filepath:
+            key = filepath
+        else:
+            key = new_untitled_key()
+            _claimed_drafts.add(key)
+
+        self.drafts.save(key, content)
+        if key != old_key:
+            if old_key and old_key.startswith(UNTITLED_PREFIX):
+                # Only this window ever writes its untitled draft
+                self.drafts.remove(old_key)
+                _claimed_drafts.discard(old_key)
+            self.draft_key = key
+        if self.state.get("draft") != key:
+            self.state["draft"] = key
+            self.save_state()
+
+    def close(self):
+        """Write everything out and let other windows take this draft."""
+        self.flush()
+        _claimed_drafts.discard(self.draft_key)
 
     def get_cursor_position(self):
         return self.state.get("cursor_position", 0)
@@ -156,7 +258,7 @@ class StateManager:
         }
 
         buffer = sidebar.buffer
-        self.state["content"] = sidebar.get_text()
+        self.save_content(sidebar.get_text(), self.get_current_file())
         cursor = buffer.get_iter_at_mark(buffer.get_insert())
         self.state["cursor_position"] = cursor.get_offset()
 
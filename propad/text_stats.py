@@ -0,0 +1,44 @@
+"""Word, letter and paragraph counts kept up to date line by line."""
+
+
+def line_counts(line: str) -> tuple[int, int, int]:
+    """Return (words, letters, paragraphs) for one line without its newline.
+
+    Letters are non-whitespace characters and every non-blank line counts
+    as a paragraph, as the status label has always shown them.
+    """
+    words = line.split()
+    if not words:
+        return 0, 0, 0
+    return len(words), sum(map(len, words)), 1
+
+
+class TextStats:
+    """Document totals with a counter per line.
+
+    An edit only recounts the lines it touched, so its cost depends on the
+    size of the edit, not of the document.
+    """
+
+    def __init__(self, text: str = ""):
+        self.reset(text)
+
+    def reset(self, text: str):
+        self._lines = [line_counts(line) for line in text.split("\n")]
+        self.words = sum(counts[0] for counts in self._lines)
+        self.letters = sum(counts[1] for counts in self._lines)
+        self.paragraphs = sum(counts[2] for counts in self._lines)
+
+    def replace_lines(self, first: int, count: int, lines):
+        """Replace count lines starting at first with the given line texts."""
+        old = self._lines[first:first + count]
+        new = [line_counts(line) for line in lines]
+        self._lines[first:first + count] = new
+
+        self.words += sum(c[0] for c in new) - sum(c[0] for c in old)
+        self.letters += sum(c[1] for c in new) - sum(c[1] for c in old)
+        self.paragraphs += sum(c[2] for c in new) - sum(c[2] for c in old)
+
+    @property
+    def line_count(self) -> int:
+        return len(self._lines)
@@ -1,5 +1,4 @@
 import gi
-import threading
 from concurrent.futures import ThreadPoolExecutor
 import time
 
@@ -13,13 +12,26 @@ from propad.state_manager import StateManager
 from propad.file_manager import FileManagerDialog, FileHistory
 from propad.export_dialog import ExportDialog
 from propad.shortcuts_window import ShortcutsWindow
+from propad.incremental import IncrementalRenderer
+from propad.render import RenderPipeline
+from propad.scheduler import RenderScheduler
+from propad.render_worker import RenderWorker
+from propad.journal import COMMIT_INTERVAL, EditJournal, recover
 from propad.i18n import _
 
-import comrak
 import os
 
 UI_FILE = "ui/window.ui"
 
+# Bounds for the adaptive render debounce, in milliseconds
+MIN_RENDER_INTERVAL = 16
+MAX_RENDER_INTERVAL = 1000
+# Extra debounce per character, so huge documents render less often
+RENDER_INTERVAL_PER_CHAR = 1 / 20000
+
+# Render in a separate process so a runaway document can be killed
+USE_RENDER_WORKER = os.environ.get("PROPAD_RENDER_WORKER", "0") == "1"
+
 
 @Gtk.Template(filename=UI_FILE)
 class Window(Adw.ApplicationWindow):
@@ -56,10 +68,18 @@ class Window(Adw.ApplicationWindow):
         # Thread pool for parallel operations
         self._thread_pool = ThreadPoolExecutor(max_workers=6)
 
-        # Debounce timer for text updates
+        # Debounce timer for text updates; the text itself is only fetched
+        # from the editor once the timer fires
         self._update_timer_id = None
-        self._pending_text = None
-        self._rendering_lock = threading.Lock()
+        self._pending_version = None
+        self.render_interval = MIN_RENDER_INTERVAL
+        # Set when edits went unrendered while the preview could not be seen
+        self._preview_stale = False
+        # Editor version last written to the saved state
+        self._saved_content_version = None
+        # Every edit is journaled so a crash loses well under a second
+        self.journal = EditJournal()
+        self._journal_commit_id = None
 
         self.file_history = FileHistory()
 
@@ -73,15 +93,20 @@ class Window(Adw.ApplicationWindow):
         self.toggle_sync_scroll_btn.connect("clicked", self._on_toggle_sync_scroll)
 
         self.sidebar_widget = SidebarWidget(parent_window=self)
-        self.webview_widget = WebViewWidget()
-
-        self.extension_options = comrak.ExtensionOptions()
-        self.extension_options.table = True
-        self.extension_options.strikethrough = True
-        self.extension_options.autolink = True
-        self.extension_options.tasklist = True
-        self.extension_options.superscript = True
-        self.extension_options.footnotes = True
+        # One pipeline for the preview and export
+        self.render_pipeline = RenderPipeline()
+        self.extension_options = self.render_pipeline.extension_options
+        self.webview_widget = WebViewWidget(pipeline=self.render_pipeline)
+
+        # Only blocks touched by an edit are re-rendered
+        self.markdown_renderer = IncrementalRenderer(
+            self.extension_options, cache=self.render_pipeline.cache
+        )
+        self.render_worker = RenderWorker() if USE_RENDER_WORKER else None
+        render = (self.render_worker or self.markdown_renderer).render_blocks
+        self.render_scheduler = RenderScheduler(
+            self._thread_pool, render, self._show_blocks
+        )
 
         # Desktop view initially
         self.sidebar_container.append(self.sidebar_widget)
@@ -115,9 +140,12 @@ class Window(Adw.ApplicationWindow):
             self._render_markdown_async(text)
 
         # Connect to text buffer changes with debouncing
-        def on_text_update(text):
+        def on_text_update(version, changes):
+            self.journal.append(version, changes)
+            self._schedule_journal_commit()
+
             self.is_typing = True
-            self._debounced_render(text)
+            self._debounced_render(version)
             self.content_modified = True
             self._update_title()
 
@@ -126,9 +154,14 @@ class Window(Adw.ApplicationWindow):
 
             if self._typing_debounce_id:
                 GLib.source_remove(self._typing_debounce_id)
-            self._typing_debounce_id = GLib.timeout_add(300, self._reset_typing_state)
+            self._typing_debounce_id = GLib.timeout_add(
+                self.render_interval + 200, self._reset_typing_state
+            )
 
         self.sidebar_widget.connect_text_changed(on_text_update)
+        # Journal from the text as it is now; edits before this point,
+        # like the welcome text, never reached on_text_update
+        self.journal.start(*self.sidebar_widget.get_snapshot(), self.current_file)
 
         self.sidebar_widget.connect_hide_webview(self._on_hide_webview)
 
@@ -150,15 +183,14 @@ class Window(Adw.ApplicationWindow):
 
         self.connect("close-request", self._on_close_request)
 
+        # Minimized windows (GTK 4.12+) stop rendering their preview
+        if hasattr(self.props, "suspended"):
+            self.connect("notify::suspended", self._update_preview_visibility)
+
         GLib.timeout_add_seconds(30, self._auto_save_state)
 
     def _on_theme_changed(self, style_manager, param):
-        current_text = self.sidebar_widget.get_text()
-        html = comrak.render_markdown(
-            current_text, extension_options=comrak.ExtensionOptions()
-        )
-        self.webview_widget.load_html(html, is_dark=self.is_dark_mode())
-
+        # The preview follows the style manager on its own
         self.sidebar_widget._apply_theme(self.is_dark_mode())
 
     def _reset_typing_state(self):
@@ -168,6 +200,25 @@ class Window(Adw.ApplicationWindow):
 
         return False
 
+    def _schedule_journal_commit(self):
+        if self._journal_commit_id is None:
+            self._journal_commit_id = GLib.timeout_add(
+                COMMIT_INTERVAL, self._on_journal_commit
+            )
+
+    def _on_journal_commit(self):
+        """Write the edits of the last interval to the journal in one go."""
+        self._journal_commit_id = None
+        self.journal.commit()
+        if self.journal.needs_compaction():
+            self.journal.compact(*self.sidebar_widget.get_snapshot())
+        return False
+
+    def _update_journal_file(self):
+        """Journal the text under the current file from now on."""
+        if self.journal.key != self.current_file:
+            self.journal.start(*self.sidebar_widget.get_snapshot(), self.current_file)
+
     def _setup_bidirectional_scroll_sync(self):
         self._last_sidebar_percentage = 0.0
         self._last_webview_percentage = 0.0
@@ -181,8 +232,8 @@ class Window(Adw.ApplicationWindow):
                 self._last_sidebar_percentage = percentage
                 self._scroll_lock = True
 
-                # Scroll webview
-                self.webview_widget.scroll_to_percentage(percentage)
+                # Line up the preview with the editor's top source line
+                self.webview_widget.scroll_to_line(self.sidebar_widget.get_top_line())
 
                 # Reset lock
                 GLib.timeout_add(100, lambda: setattr(self, "_scroll_lock", False))
@@ -197,7 +248,11 @@ class Window(Adw.ApplicationWindow):
                 self._last_webview_percentage = percentage
                 self._scroll_lock = True
 
-                self.sidebar_widget.scroll_to_percentage(percentage)
+                line = self.webview_widget.scroll_line
+                if line is None:
+                    self.sidebar_widget.scroll_to_percentage(percentage)
+                else:
+                    self.sidebar_widget.scroll_to_line(line)
 
                 GLib.timeout_add(100, lambda: setattr(self, "_scroll_lock", False))
 
@@ -226,45 +281,91 @@ class Window(Adw.ApplicationWindow):
             self.toggle_sync_scroll_btn.set_tooltip_text(_("Sync Scroll Disabled"))
             self.toggle_sync_scroll_btn.add_css_class("dim-label")
 
-    def _debounced_render(self, text):
+    def _debounced_render(self, version):
         """Debounce text rendering to avoid excessive updates."""
-        self._pending_text = text
+        if not self._is_preview_visible():
+            # Rendered once when the preview is shown again
+            self._preview_stale = True
+            return
+        self._pending_version = version
+        self.render_interval = self._compute_render_interval(
+            self.sidebar_widget.get_char_count()
+        )
 
         if self._update_timer_id:
             GLib.source_remove(self._update_timer_id)
 
-        self._update_timer_id = GLib.timeout_add(100, self._process_pending_text)
+        self._update_timer_id = GLib.timeout_add(
+            self.render_interval, self._process_pending_text
+        )
+
+    def _compute_render_interval(self, text_length: int) -> int:
+        """Pick a debounce from the measured render cost and document size."""
+        # Waiting twice the render cost keeps rendering under half the CPU
+        cost_ms = self.render_scheduler.average_cost * 1000
+        interval = 2 * cost_ms + text_length * RENDER_INTERVAL_PER_CHAR
+        return int(max(MIN_RENDER_INTERVAL, min(MAX_RENDER_INTERVAL, interval)))
+
+    def get_render_diagnostics(self) -> dict:
+        """Return the current debounce, measured render cost and cache use."""
+        # The worker renders with its own IncrementalRenderer
+        renderer = self.render_worker or self.markdown_renderer
+        diagnostics = {
+            "render_interval_ms": self.render_interval,
+            "last_render_ms": self.render_scheduler.last_cost * 1000,
+            "average_render_ms": self.render_scheduler.average_cost * 1000,
+            "dropped_renders": self.render_scheduler.dropped,
+            "blocks_rendered": renderer.last_dirty,
+            "cache": self.render_pipeline.cache.stats(),
+        }
+        if self.render_worker is not None:
+            diagnostics["worker_restarts"] = self.render_worker.restarts
+            diagnostics["worker_timeouts"] = self.render_worker.timeouts
+        return diagnostics
 
     def _process_pending_text(self):
         """Process pending text after debounce period."""
-        if self._pending_text is not None:
-            self._render_markdown_async(self._pending_text)
-            self._pending_text = None
         self._update_timer_id = None
+        if self._pending_version is not None:
+            self._pending_version = None
+            # The preview may have been hidden since the edit
+            if not self._is_preview_visible():
+                self._preview_stale = True
+                return False
+            _, text = self.sidebar_widget.get_snapshot()
+            self._render_markdown_async(text)
         return False
 
     def _render_markdown_async(self, text):
-        """Render markdown in background thread."""
-
-        def render():
-            with self._rendering_lock:
-                try:
-                    # Render markdown with GPU acceleration
-                    html = comrak.render_markdown(
-                        text, extension_options=self.extension_options
-                    )
-
-                    # Load HTML in main thread (WebKit requires main thread)
-                    GLib.idle_add(
-                        lambda: self.webview_widget.load_html(
-                            html, is_dark=self.is_dark_mode()
-                        )
-                    )
-                except Exception as e:
-                    print(f"Error rendering markdown: {e}")
+        """Render markdown in background thread, newest text only."""
+        if not self._is_preview_visible():
+            # The buffer is rendered as a whole when the preview is shown
+            self._preview_stale = True
+            self.render_scheduler.cancel()
+            return
+        self._preview_stale = False
+        self.render_scheduler.submit(text)
+
+    def _is_preview_visible(self) -> bool:
+        if self.webview_hidden:
+            return False
+        return not (hasattr(self.props, "suspended") and self.props.suspended)
+
+    def _update_preview_visibility(self, *args):
+        """Suspend the preview while hidden, and catch it up when shown."""
+        visible = self._is_preview_visible()
+        self.webview_widget.set_suspended(not visible)
+        if visible and self._preview_stale:
+            _, text = self.sidebar_widget.get_snapshot()
+            self._render_markdown_async(text)
 
-        # Submit to thread pool
-        self._thread_pool.submit(render)
+    def _show_blocks(self, blocks):
+        # Called in main thread (WebKit requires main thread)
+        self.webview_widget.update_blocks(
+            blocks,
+            is_dark=self.is_dark_mode(),
+            processed=self.render_worker is not None,
+        )
 
     def _setup_headerbar_buttons(self):
         """Add file operation buttons to the headerbar."""
@@ -382,6 +483,7 @@ class Window(Adw.ApplicationWindow):
         """Create new empty file."""
         self.sidebar_widget.set_text("")
         self.current_file = None
+        self._update_journal_file()
         self.content_modified = False
         self._update_title()
         return False
@@ -438,6 +540,7 @@ class Window(Adw.ApplicationWindow):
         """Finish loading file in main thread."""
         self.sidebar_widget.set_text(content)
         self.current_file = filepath
+        self._update_journal_file()
         self.content_modified = False
         self._update_title()
         self.state_manager.save_current_file(filepath)
@@ -477,6 +580,7 @@ class Window(Adw.ApplicationWindow):
                 is_new = not os.path.exists(filepath)
                 self._save_to_file(filepath, is_new=is_new)
                 self.current_file = filepath
+                self._update_journal_file()
                 self._update_title()
 
                 if hasattr(self, "_save_as_for_new") and self._save_as_for_new:
@@ -546,6 +650,13 @@ class Window(Adw.ApplicationWindow):
             self.maximize()
 
         content = self.state_manager.get_content()
+        self.current_file = self.state_manager.get_current_file()
+        # Edits a crashed window had not saved yet
+        recovered = recover(self.current_file)
+        if recovered is not None and recovered != content:
+            content = recovered
+        else:
+            recovered = None
         if content:
             self.sidebar_widget.set_text(content)
             cursor_pos = self.state_manager.get_cursor_position()
@@ -555,8 +666,6 @@ class Window(Adw.ApplicationWindow):
                 # If sidebar doesn't expose set_cursor_position, ignore
                 pass
 
-        self.current_file = self.state_manager.get_current_file()
-
         self.webview_hidden = self.state_manager.is_webview_hidden()
 
         self.sync_scroll_enabled = self.state_manager.state.get(
@@ -568,7 +677,8 @@ class Window(Adw.ApplicationWindow):
         if self.webview_hidden:
             GLib.idle_add(self._apply_webview_hidden_state)
 
-        self.content_modified = False
+        self.content_modified = recovered is not None
+        self._update_title()
 
         scroll_positions = self.state_manager.get_scroll_positions()
         saved_sidebar_scroll = scroll_positions.get("sidebar", 0.0)
@@ -743,6 +853,7 @@ class Window(Adw.ApplicationWindow):
 
             self.sidebar_widget.set_text(content)
             self.current_file = filepath
+            self._update_journal_file()
             self.content_modified = False
             self._update_title()
             self.state_manager.save_current_file(filepath)
@@ -772,33 +883,42 @@ class Window(Adw.ApplicationWindow):
             self.sidebar_widget.hide_webview_btn.set_icon_name("window-close-symbolic")
             self.sidebar_widget.hide_webview_btn.set_tooltip_text("Hide Preview")
 
+        self._update_preview_visibility()
+
     def _auto_save_state(self):
         self._save_state()
         return True
 
     def _save_state(self):
-        def save_async():
-            width, height = self.get_default_size()
-            self.state_manager.state["window"] = {
-                "width": width,
-                "height": height,
-                "maximized": self.is_maximized(),
-            }
-
-            self.state_manager.save_content(self.sidebar_widget.get_text())
-            cursor_pos = self.sidebar_widget.get_cursor_position()
-            self.state_manager.save_cursor_position(cursor_pos)
-            self.state_manager.save_current_file(self.current_file)
-
-            sidebar_visible = self.adw_overlay_split_view.get_show_sidebar()
-            self.state_manager.save_sidebar_visible(sidebar_visible)
-            self.state_manager.save_webview_hidden(self.webview_hidden)
-
-            # Save sync scroll state
-            self.state_manager.state["sync_scroll_enabled"] = self.sync_scroll_enabled
-            self.state_manager.save_state()
+        # The setters only mark the state dirty; StateManager writes it
+        # out once, in the background
+        version, content = self.sidebar_widget.get_snapshot()
+
+        width, height = self.get_default_size()
+        self.state_manager.state["window"] = {
+            "width": width,
+            "height": height,
+            "maximized": self.is_maximized(),
+        }
+
+        # Save As and Open change the file without a new version
+        if (
+            version != self._saved_content_version
+            or not self.state_manager.is_draft_for(self.current_file)
+        ):
+            self.state_manager.save_content(content, self.current_file)
+            self._saved_content_version = version
+        cursor_pos = self.sidebar_widget.get_cursor_position()
+        self.state_manager.save_cursor_position(cursor_pos)
+        self.state_manager.save_current_file(self.current_file)
+
+        sidebar_visible = self.adw_overlay_split_view.get_show_sidebar()
+        self.state_manager.save_sidebar_visible(sidebar_visible)
+        self.state_manager.save_webview_hidden(self.webview_hidden)
 
-        self._thread_pool.submit(save_async)
+        # Save sync scroll state
+        self.state_manager.state["sync_scroll_enabled"] = self.sync_scroll_enabled
+        self.state_manager.save_state()
 
     def _on_close_request(self, window):
         """Handle window close request."""
@@ -814,6 +934,15 @@ class Window(Adw.ApplicationWindow):
 
         # Save rest of the state
         self._save_state()
+        self.state_manager.close()
+        # The draft now holds the text, so the journal is not needed
+        if self._journal_commit_id is not None:
+            GLib.source_remove(self._journal_commit_id)
+            self._journal_commit_id = None
+        self.journal.close()
+        self.file_history.flush()
+        if self.render_worker is not None:
+            self.render_worker.close()
         time.sleep(0.1)
         return False
 
@@ -832,6 +961,7 @@ class Window(Adw.ApplicationWindow):
 
     def set_current_file(self, filepath):
         self.current_file = filepath
+        self._update_journal_file()
         self.content_modified = False
         self._update_title()
         self.state_manager.save_current_file(filepath)
@@ -872,6 +1002,7 @@ class Window(Adw.ApplicationWindow):
             self.sidebar_widget.hide_webview_btn.set_icon_name("window-close-symbolic")
             self.sidebar_widget.hide_webview_btn.set_tooltip_text("Hide Preview")
 
+        self._update_preview_visibility()
         self.state_manager.save_webview_hidden(self.webview_hidden)
 
     def _on_layout_changed(self, multi_layout: Adw.MultiLayoutView, _) -> None:
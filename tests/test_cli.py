@@ -0,0 +1,101 @@
+import os
+
+from propad.cli import collect_sources, output_targets, render_command
+
+
+def _write(path, text="# Title\n"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _names(sources):
+    return [name for _, name in sources]
+
+
+def test_directory_walk(tmp_path):
+    root = str(tmp_path / "docs")
+    _write(f"{root}/b.md")
+    _write(f"{root}/a.markdown")
+    _write(f"{root}/sub/c.md")
+    _write(f"{root}/notes.txt")
+    assert _names(collect_sources([root])) == [
+        "a.markdown",
+        "b.md",
+        os.path.join("sub", "c.md"),
+    ]
+
+
+def test_duplicate_inputs(tmp_path):
+    root = str(tmp_path / "docs")
+    _write(f"{root}/a.md")
+    _write(f"{root}/sub/b.md")
+    sources = collect_sources([root, f"{root}/a.md", f"{root}/**/*.md"])
+    # Every file once, named by the input that found it first
+    assert _names(sources) == ["a.md", os.path.join("sub", "b.md")]
+
+
+def test_glob_keeps_relative_paths(tmp_path):
+    _write(str(tmp_path / "one/readme.md"))
+    _write(str(tmp_path / "two/readme.md"))
+    sources = collect_sources([f"{tmp_path}/*/readme.md"])
+    assert _names(sources) == [
+        os.path.join("one", "readme.md"),
+        os.path.join("two", "readme.md"),
+    ]
+    targets, clashes = output_targets(sources, "out")
+    assert not clashes
+    assert len({target for _, target in targets}) == 2
+
+
+def test_clashing_outputs(tmp_path):
+    _write(str(tmp_path / "a/page.md"))
+    _write(str(tmp_path / "b/page.md"))
+    _write(str(tmp_path / "a/x.md"))
+    _write(str(tmp_path / "a/x.markdown"))
+    sources = collect_sources(
+        [str(tmp_path / "a/page.md"), str(tmp_path / "b/page.md")]
+    )
+    targets, clashes = output_targets(sources, "out")
+    assert len(targets) == 1
+    assert clashes == [(str(tmp_path / "b/page.md"), str(tmp_path / "a/page.md"))]
+
+    _, clashes = output_targets(collect_sources([str(tmp_path / "a")]), "out")
+    assert len(clashes) == 1
+    assert render_command([str(tmp_path / "a"), "-o", str(tmp_path / "out")]) == 2
+
+
+def test_output_inside_source_tree(tmp_path):
+    root = str(tmp_path / "docs")
+    out = os.path.join(root, "site")
+    _write(f"{root}/a.md")
+    _write(f"{root}/sub/b.md")
+    targets, _ = output_targets(collect_sources([root]), out)
+    assert [target for _, target in targets] == [
+        os.path.join(out, "a"),
+        os.path.join(out, "sub", "b"),
+    ]
+
+    for _ in range(2):
+        # The output of the first run is not picked up by the second
+        assert render_command([root, "-o", out, "-q", "-j", "1"]) == 0
+        assert sorted(
+            os.path.relpath(os.path.join(dirpath, name), out)
+            for dirpath, _, names in os.walk(out)
+            for name in names
+        ) == ["a.html", os.path.join("sub", "b.html")]
+    with open(os.path.join(out, "a.html"), encoding="utf-8") as f:
+        assert "<h1>Title</h1>" in f.read()
+
+
+def test_failures_exit_nonzero(tmp_path):
+    root = str(tmp_path / "docs")
+    _write(f"{root}/good.md")
+    with open(f"{root}/bad.md", "wb") as f:
+        f.write(b"\xff\xfe not utf-8")
+    out = str(tmp_path / "out")
+    assert render_command([root, "-o", out, "-q", "-j", "1"]) == 1
+    assert os.path.exists(os.path.join(out, "good.html"))
+    assert not os.path.exists(os.path.join(out, "bad.html"))
+
+    assert render_command([str(tmp_path / "missing.md"), "-o", out]) == 1
@@ -0,0 +1,108 @@
+import random
+import time
+
+import comrak
+
+from propad.incremental import IncrementalRenderer, split_blocks
+from propad.render import make_extension_options
+
+OPTIONS = make_extension_options()
+
+CASES = [
+    # A setext underline is not a list item, so the fence below it is
+    # closed where a full parse closes it
+    "  cont\n---\n ```\niv>\n...\n```\n| text *em*\n",
+    "* * *\n  ```\ncode\n```\nafter *em*\n",
+    "-\n ```\nx\n```\npara\n",
+    # Definitions inside containers and spread over lines
+    "> [foo]: http://q\n\nSee [foo] here.\n",
+    "- item\n[foo]: http://lazy\n\nSee [foo] here.\n",
+    "See [foo] here.\n\n[foo]:\n  http://next-line\n",
+    "See [foo] here.\n\n[foo]: http://x\n",
+    # The first definition of a label wins
+    "[ref]: http://first\nsee [ref]\n\npara\n\n[ref]: http://second\n",
+    "[  ]: /blank\n\ntext\n",
+    "# Title\n\nText with a footnote[^1].\n\n[^1]: The note.\n",
+    "[FOO][] and [text][a\nb] and ![img][foo]\n\n[a b]: /ab\n[Foo]: /foo\n",
+    # The end marker of an HTML block may overlap its opener
+    "<?>\n```\n<?>\n<!--->\n",
+]
+
+PIECES = [
+    "# Head\n", "para line\n", "\n", "\n\n", "- item\n", "  cont\n", "1. one\n",
+    "```\n", " ```\n", "code\n", "~~~\n", "> quote\n", "> [!NOTE]\n",
+    "| a | b |\n", "|---|---|\n", "    indented\n", "<!--\n", "-->\n",
+    "[ref]: http://x.com\n", "> [ref]: http://q\n", "[ref]:\n", "  http://w\n",
+    "see [ref]\n", "***\n", "* * *\n", "===\n", "---\n", "<pre>\n", "</pre>\n",
+    "  - nested\n", "\t tab\n", "-\n",
+]
+
+
+def _full(text):
+    return comrak.render_markdown(text, extension_options=OPTIONS)
+
+
+def test_blocks_cover_text():
+    for text in CASES:
+        blocks = split_blocks(text)
+        assert "".join(text[b.start:b.end] for b in blocks) == text
+
+
+def test_matches_full_render():
+    for text in CASES:
+        assert IncrementalRenderer(OPTIONS).render(text) == _full(text), text
+
+
+def test_edits_match_full_render():
+    rng = random.Random(0)
+    for _ in range(150):
+        renderer = IncrementalRenderer(OPTIONS)
+        text = "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 30)))
+        for _ in range(10):
+            assert renderer.render(text) == _full(text), text
+            start = rng.randint(0, len(text))
+            end = min(len(text), start + rng.choice([0, 0, 1, 3, 10]))
+            insert = rng.choice(["", rng.choice(PIECES), "x", "\n", "-", ">", "`"])
+            text = text[:start] + insert + text[end:]
+
+
+def test_definition_change_updates_block():
+    renderer = IncrementalRenderer(OPTIONS)
+    text = "See [foo] here.\n\n"
+    before = renderer.render_blocks(text)
+    text += "[foo]: http://x\n"
+    after = renderer.render_blocks(text)
+    assert "".join(block[1] for block in after) == _full(text)
+    # Same source, new html: the preview must see a new key
+    assert after[0][0] != before[0][0]
+
+
+def _best_time(call, runs=3):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        call()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def test_edit_with_many_definitions_stays_cheap():
+    body = "".join(
+        f"Paragraph {i} uses [ref{i % 300}] and [r{i}].\n\n[r{i}]: /r/{i}\n\n"
+        for i in range(1000)
+    )
+    text = body + "".join(f"[ref{i}]: /ref/{i}\n" for i in range(300))
+    renderer = IncrementalRenderer(OPTIONS)
+    renderer.render(text)
+    full = _best_time(lambda: _full(text))
+
+    def edit(pos):
+        nonlocal text
+        text = text[:pos] + "x" + text[pos:]
+        renderer.render_blocks(text)
+
+    # Inside the definition list, and in a definition between paragraphs
+    for pos in (len(body) + 50, len(body) // 2 + 10):
+        assert _best_time(lambda: edit(pos)) < 5 * full + 0.02
+    assert renderer.render(text) == _full(text)
@@ -0,0 +1,95 @@
+import json
+import os
+
+from propad.journal import EditJournal, recover, replay
+
+
+def _crash(journal):
+    """Leave the journal behind the way a crashed window does."""
+    journal._writer.submit(lambda: journal._file.close()).result()
+
+
+def _journal(tmp_path, text="abc", key="/doc.md", version=0):
+    journal = EditJournal(str(tmp_path), fsync=False)
+    journal.start(version, text, key)
+    return journal
+
+
+def test_replay_applies_edits(tmp_path):
+    journal = _journal(tmp_path)
+    journal.append(2, [(3, 0, "d"), (0, 1, "")])
+    journal.commit()
+    journal.append(3, [(3, 0, "!")])
+    journal.commit()
+    _crash(journal)
+    with open(journal.path, "rb") as f:
+        assert replay(f) == ("bcd!", "/doc.md", True)
+
+
+def test_replay_reports_gap():
+    lines = [
+        json.dumps(["snapshot", 0, "ab", None]),
+        json.dumps([1, 0, 0, "x"]),
+        json.dumps([3, 0, 0, "y"]),
+    ]
+    assert replay(lines) == ("xab", None, False)
+
+
+def test_replay_torn_last_line_is_complete():
+    lines = [json.dumps(["snapshot", 0, "ab", None]), json.dumps([1, 2, 0, "c"]), "[2, 0"]
+    assert replay(lines) == ("abc", None, True)
+    # A bad line with more after it is not what a crash leaves
+    lines.insert(1, "[1, 0")
+    assert replay(lines) == ("ab", None, False)
+
+
+def test_start_after_unjournaled_edits(tmp_path):
+    # The buffer may be at any version when journaling starts
+    journal = _journal(tmp_path, text="welcome", version=5)
+    journal.append(6, [(7, 0, "!")])
+    journal.commit()
+    _crash(journal)
+    assert recover("/doc.md", str(tmp_path)) == "welcome!"
+    assert not os.listdir(tmp_path)
+
+
+def test_recover_only_into_own_document(tmp_path):
+    mine = _journal(tmp_path, text="mine", key="/a.md")
+    untitled = _journal(tmp_path, text="untitled", key=None)
+    _crash(mine)
+    _crash(untitled)
+
+    assert recover("/b.md", str(tmp_path)) is None
+    assert len(os.listdir(tmp_path)) == 2
+    assert recover("/a.md", str(tmp_path)) == "mine"
+    assert recover(None, str(tmp_path)) == "untitled"
+    assert not os.listdir(tmp_path)
+
+
+def test_recover_drops_journal_with_gap(tmp_path):
+    journal = _journal(tmp_path)
+    # Edits 1 to 4 never reached the journal
+    journal.append(5, [(0, 0, "x")])
+    journal.commit()
+    _crash(journal)
+    assert recover("/doc.md", str(tmp_path)) is None
+    assert not os.listdir(tmp_path)
+
+
+def test_recover_skips_running_window(tmp_path):
+    journal = _journal(tmp_path)
+    journal.commit()
+    assert recover("/doc.md", str(tmp_path)) is None
+    journal.close()
+    assert not os.listdir(tmp_path)
+
+
+def test_compact_keeps_text(tmp_path):
+    journal = _journal(tmp_path)
+    journal.append(1, [(3, 0, "d")])
+    journal.commit()
+    journal.compact(1, "abcd")
+    journal.append(2, [(0, 0, ">")])
+    journal.commit()
+    _crash(journal)
+    assert recover("/doc.md", str(tmp_path)) == ">abcd"
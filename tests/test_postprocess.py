@@ -0,0 +1,123 @@
+import html as html_lib
+import re
+import time
+
+import comrak
+
+from propad.postprocess import ALERT_ICONS, postprocess_html
+from propad.render import make_extension_options
+
+OPTIONS = make_extension_options()
+
+DOCS = [
+    "```mermaid\ngraph TD\n  A-->B & C\n```\n",
+    'Text\n\n```mermaid\nsequenceDiagram\n  A->>B: "hi"\n```\n\nMore\n',
+    "```python\nif x < 1:\n    pass\n```\n\nInline `code` and `<b>`.\n",
+    "Math $x^2 < y$ and $$\\frac{a}{b}$$ stay as written.\n",
+    "- [ ] open\n- [x] done\n",
+    "> [!NOTE]\n> Useful information.\n",
+    "> [!tip]\n> First paragraph.\n>\n> Second paragraph.\n",
+    "> [!WARNING]\n> Check these:\n>\n> - [ ] one\n> - [x] two\n",
+    "> [!CAUTION]\n> Math $a < b$ here.\n\n> A plain quote.\n",
+    "> [!IMPORTANT]\n> Diagram:\n>\n> ```mermaid\n> graph LR\n>   X-->Y\n> ```\n",
+    "> [!UNKNOWN]\n> Not an alert.\n",
+]
+
+
+def _render(text):
+    return comrak.render_markdown(text, extension_options=OPTIONS)
+
+
+def _multi_pass(html):
+    """The regex passes postprocess_html replaced, for comparison."""
+    mermaid_patterns = [
+        re.compile(
+            r'<pre><code class="language-mermaid">(.*?)</code></pre>', re.DOTALL
+        ),
+        re.compile(r'<pre lang="mermaid"><code>(.*?)</code></pre>', re.DOTALL),
+        re.compile(r'<code class="language-mermaid">(.*?)</code>', re.DOTALL),
+        re.compile(r"```mermaid\s*(.*?)\s*```", re.DOTALL),
+    ]
+
+    def replace_mermaid(match):
+        code = (
+            match.group(1)
+            .strip()
+            .replace("&lt;", "<")
+            .replace("&gt;", ">")
+            .replace("&amp;", "&")
+            .replace("&quot;", '"')
+        )
+        escaped = html_lib.escape(code)
+        return f'<div class="mermaid" data-source="{escaped}">{escaped}</div>'
+
+    for pattern in mermaid_patterns:
+        html = pattern.sub(replace_mermaid, html)
+
+    def replace_alert(match):
+        kind = match.group(1).upper()
+        content = match.group(2).strip() + match.group(3).strip()
+        return f"""<div class="alert alert-{kind.lower()}" data-alert-type="{kind}">
+        <div class="alert-title">
+            {ALERT_ICONS[kind]}
+            <span class="alert-title-text">{kind.title()}</span>
+        </div>
+        <div class="alert-content">{content}</div>
+    </div>"""
+
+    alert_pattern = re.compile(
+        r"<blockquote>\s*<p>\[!(NOTE|TIP|IMPORTANT|WARNING|CAUTION)\]\s*(.*?)</p>"
+        r"(.*?)</blockquote>",
+        re.DOTALL | re.IGNORECASE,
+    )
+    return alert_pattern.sub(replace_alert, html)
+
+
+def test_matches_multi_pass():
+    for text in DOCS:
+        html = _render(text)
+        assert postprocess_html(html) == _multi_pass(html), text
+
+
+def test_mermaid_becomes_diagram():
+    html = postprocess_html(_render(DOCS[0]))
+    source = html_lib.escape("graph TD\n  A-->B & C")
+    assert html == f'<div class="mermaid" data-source="{source}">{source}</div>\n'
+
+
+def test_other_blocks_untouched():
+    # Code, math and task lists pass through, even next to an alert
+    for text in DOCS[2:5]:
+        html = _render(text)
+        assert postprocess_html(html) == html
+        alert = _render("> [!NOTE]\n> x\n")
+        assert postprocess_html(html + alert).startswith(html)
+
+
+def test_nested_alerts():
+    html = postprocess_html(
+        _render("> [!NOTE]\n> outer\n>\n> > [!TIP]\n> > inner\n>\n> after\n")
+    )
+    assert html.count('class="alert ') == 2
+    assert "<blockquote>" not in html and "</blockquote>" not in html
+    assert html.index("inner") < html.index("after")
+
+
+def _timed(html):
+    start = time.perf_counter()
+    postprocess_html(html)
+    return time.perf_counter() - start
+
+
+def test_linear_on_unclosed_markers():
+    pieces = [
+        "<blockquote><p>[!NOTE] x\n",
+        '<code class="language-mermaid">x\n',
+        "```mermaid x\n",
+        "<blockquote>\n",
+    ]
+    for piece in pieces:
+        small = min(_timed(piece * 5000) for _ in range(3))
+        large = min(_timed(piece * 40000) for _ in range(3))
+        # Eight times the input; a quadratic scan would take 64 times longer
+        assert large < 20 * small + 0.05, piece
@@ -0,0 +1,73 @@
+import random
+
+from propad.text_stats import TextStats
+
+PIECES = [
+    "word",
+    "two words",
+    " ",
+    "  ",
+    "\n",
+    "\n\n",
+    "x",
+    "é",
+    "\t",
+    "a\nb",
+    "end.\n",
+]
+
+
+def _totals(stats):
+    return stats.words, stats.letters, stats.paragraphs, stats.line_count
+
+
+def _insert(stats, text, offset, inserted):
+    """Apply an insertion the way the editor reports it."""
+    first = text.count("\n", 0, offset)
+    text = text[:offset] + inserted + text[offset:]
+    last = first + inserted.count("\n")
+    stats.replace_lines(first, 1, text.split("\n")[first : last + 1])
+    return text
+
+
+def _delete(stats, text, start, end):
+    """Apply a deletion the way the editor reports it."""
+    first = text.count("\n", 0, start)
+    last = text.count("\n", 0, end)
+    text = text[:start] + text[end:]
+    stats.replace_lines(first, last - first + 1, [text.split("\n")[first]])
+    return text
+
+
+def test_counts():
+    stats = TextStats("Hello world\n\n  two  words here \nlast")
+    assert _totals(stats) == (6, 26, 3, 4)
+
+
+def test_edits_match_recount():
+    rng = random.Random(0)
+    for _ in range(200):
+        text = "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 20)))
+        stats = TextStats(text)
+        for _ in range(20):
+            start = rng.randint(0, len(text))
+            if rng.random() < 0.5:
+                text = _insert(stats, text, start, rng.choice(PIECES))
+            else:
+                end = min(len(text), start + rng.choice([1, 2, 5, 20]))
+                text = _delete(stats, text, start, end)
+            assert _totals(stats) == _totals(TextStats(text)), repr(text)
+
+
+def test_edits_split_and_join_words():
+    stats = TextStats("hello world")
+    # Splits one word into two
+    text = _insert(stats, "hello world", 2, " ")
+    assert _totals(stats) == (3, 10, 1, 1)
+    # Joins them again, then joins across the line break
+    text = _delete(stats, text, 2, 3)
+    text = _insert(stats, text, 5, "\n")
+    assert _totals(stats) == (2, 10, 2, 2)
+    text = _delete(stats, text, 5, 7)
+    assert text == "helloworld"
+    assert _totals(stats) == (1, 10, 1, 1)